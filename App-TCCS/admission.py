@@ -0,0 +1,86 @@
+import math
+import threading
+import time
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``burst``; each request takes one."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def take(self):
+        """Take a token; returns seconds until one is available, 0 if taken."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-branch token buckets plus an in-flight limit per (route, branch).
+
+    Requests over either limit are rejected immediately rather than queued, so
+    one branch flooding a route cannot hold the database writer lock (and the
+    worker threads) that every other branch's writes need.
+    """
+
+    def __init__(self, rate, burst, max_in_flight, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._in_flight = {}
+        self._counters = {}
+
+    def _count(self, branch_id, name):
+        counters = self._counters.setdefault(branch_id, {'admitted': 0, 'shed_rate': 0, 'shed_in_flight': 0})
+        counters[name] += 1
+
+    def acquire(self, route, branch_id):
+        """Admit one request or raise ``Rejected``; pair with ``release``."""
+        with self._lock:
+            key = (route, branch_id)
+            if self._in_flight.get(key, 0) >= self.max_in_flight:
+                self._count(branch_id, 'shed_in_flight')
+                raise Rejected('Too many concurrent requests for this branch', 1)
+            bucket = self._buckets.get(branch_id)
+            if bucket is None:
+                bucket = self._buckets[branch_id] = TokenBucket(self.rate, self.burst, self.clock)
+            wait = bucket.take()
+            if wait:
+                self._count(branch_id, 'shed_rate')
+                raise Rejected('Request rate limit exceeded for this branch', max(1, math.ceil(wait)))
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            self._count(branch_id, 'admitted')
+
+    def release(self, route, branch_id):
+        with self._lock:
+            key = (route, branch_id)
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+
+    def stats(self):
+        """``{branch_id: counters}`` with ``in_flight`` (queue depth) per route."""
+        with self._lock:
+            stats = {branch_id: dict(counters, in_flight={}) for branch_id, counters in self._counters.items()}
+            for (route, branch_id), count in self._in_flight.items():
+                stats[branch_id]['in_flight'][route] = count
+            return stats
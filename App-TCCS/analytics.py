@@ -0,0 +1,163 @@
+import threading
+from datetime import date, timedelta
+import numpy as np
+
+DIMENSIONS = ('branch', 'destination', 'status', 'day', 'week', 'month')
+METRICS = ('volume', 'revenue', 'count')
+EPOCH = date(1970, 1, 1)
+# Groups are counted with a dense bincount while the key space stays this small.
+DENSE_GROUP_LIMIT = 1 << 22
+
+
+class _Dictionary:
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, values):
+        """Dictionary-encode an array of strings, extending the dictionary as needed."""
+        uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[inverse.reshape(-1)]
+
+
+class _Column:
+    def __init__(self, dtype):
+        self.data = np.empty(1024, dtype=dtype)
+
+    def reserve(self, size):
+        if size > len(self.data):
+            grown = np.empty(max(size, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:len(self.data)] = self.data
+            self.data = grown
+
+
+class ConsignmentCube:
+    """Columnar in-memory snapshot of consignments for ad-hoc group-by reports.
+
+    String dimensions are dictionary-encoded to int32 codes and creation dates
+    are stored as days since the epoch. Rows are keyed by consignment id, so
+    re-adding a row (e.g. after it is dispatched) updates it in place.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.size = 0
+        self.row_of = {}
+        self.dictionaries = {name: _Dictionary() for name in ('branch', 'destination', 'status')}
+        self.columns = {
+            'branch': _Column(np.int32),
+            'destination': _Column(np.int32),
+            'status': _Column(np.int32),
+            'day': _Column(np.int32),
+            'volume': _Column(np.float64),
+            'revenue': _Column(np.float64),
+        }
+        # Highest source seq loaded per shard and time of the last refresh; None until the first full load.
+        self.last_seqs = {}
+        self.watermark = None
+
+    def add(self, ids, branch, destination, status, day, volume, revenue):
+        """Insert or update a batch of rows given as parallel sequences."""
+        if not len(ids):
+            return
+        with self.lock:
+            values = {
+                'branch': self.dictionaries['branch'].encode(branch),
+                'destination': self.dictionaries['destination'].encode(destination),
+                'status': self.dictionaries['status'].encode(status),
+                'day': np.asarray(day, dtype=np.int32),
+                'volume': np.asarray(volume, dtype=np.float64),
+                'revenue': np.asarray(revenue, dtype=np.float64),
+            }
+            rows = np.empty(len(ids), dtype=np.int64)
+            size = self.size
+            for i, row_id in enumerate(ids):
+                row = self.row_of.get(row_id)
+                if row is None:
+                    row = self.row_of[row_id] = size
+                    size += 1
+                rows[i] = row
+            for name, column in self.columns.items():
+                column.reserve(size)
+                column.data[rows] = values[name]
+            self.size = size
+
+    def _dimension(self, name, mask):
+        """Per-row group codes and a label function for one dimension."""
+        if name in self.dictionaries:
+            values = self.dictionaries[name].values
+            return self.columns[name].data[:self.size][mask], len(values), lambda code: values[code]
+        days = self.columns['day'].data[:self.size][mask].astype(np.int64)
+        if name == 'week':
+            # 1970-01-01 was a Thursday; shift so weeks start on Monday.
+            codes = (days + 3) // 7
+            label = lambda code: (EPOCH + timedelta(days=int(code) * 7 - 3)).isoformat()
+        elif name == 'month':
+            codes = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            label = lambda code: str(np.datetime64(int(code), 'M'))
+        else:
+            codes = days
+            label = lambda code: (EPOCH + timedelta(days=int(code))).isoformat()
+        if not len(codes):
+            return codes, 1, label
+        low = int(codes.min())
+        return codes - low, int(codes.max()) - low + 1, lambda code: label(code + low)
+
+    def query(self, group_by, metrics, start_day=None, end_day=None, filters=None):
+        """Aggregate ``metrics`` grouped by ``group_by`` dimensions.
+
+        ``start_day``/``end_day`` bound the creation day (days since epoch,
+        end exclusive); ``filters`` maps dictionary dimensions to a required value.
+        """
+        with self.lock:
+            n = self.size
+            mask = np.ones(n, dtype=bool)
+            day = self.columns['day'].data[:n]
+            if start_day is not None:
+                mask &= day >= start_day
+            if end_day is not None:
+                mask &= day < end_day
+            for name, value in (filters or {}).items():
+                code = self.dictionaries[name].codes.get(value, -1)
+                mask &= self.columns[name].data[:n] == code
+            weights = {
+                'volume': self.columns['volume'].data[:n][mask],
+                'revenue': self.columns['revenue'].data[:n][mask],
+            }
+            dimensions = [self._dimension(name, mask) for name in group_by]
+        rows = int(mask.sum())
+        key = np.zeros(rows, dtype=np.int64)
+        key_space = 1
+        for codes, cardinality, _ in dimensions:
+            key = key * cardinality + codes
+            key_space *= cardinality
+        if key_space <= max(DENSE_GROUP_LIMIT, rows):
+            counts = np.bincount(key, minlength=key_space)
+            groups = np.flatnonzero(counts)
+            results = {'count': counts[groups]}
+            for name in ('volume', 'revenue'):
+                if name in metrics:
+                    results[name] = np.bincount(key, weights=weights[name], minlength=key_space)[groups]
+        else:
+            groups, inverse = np.unique(key, return_inverse=True)
+            results = {'count': np.bincount(inverse)}
+            for name in ('volume', 'revenue'):
+                if name in metrics:
+                    results[name] = np.bincount(inverse, weights=weights[name])
+        columns = []
+        for _, cardinality, label in reversed(dimensions):
+            groups, codes = np.divmod(groups, cardinality)
+            labels = np.array([label(code) for code in range(cardinality)], dtype=object)
+            columns.append(labels[codes].tolist())
+        columns.reverse()
+        for name in metrics:
+            columns.append(results[name].tolist())
+        names = list(group_by) + list(metrics)
+        return [dict(zip(names, values)) for values in zip(*columns)]
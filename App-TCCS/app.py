@@ -1,16 +1,45 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import (Flask, Response, request, jsonify, render_template, session, redirect, stream_with_context,
+                   url_for)
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+import os
 import uuid
 import bcrypt
+import click
+import numpy as np
 from functools import wraps
-from sqlalchemy import func
+from collections import defaultdict
+from itertools import chain
+from sqlalchemy import func, event, inspect, lambda_stmt, select, and_, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from admission import AdmissionController, Rejected
+from analytics import ConsignmentCube, DIMENSIONS, METRICS
+from archive import ArchiveStore
+from manifest import FORMATS as MANIFEST_FORMATS, HTML_TAIL, ManifestCache, html_head, render as render_manifest
+from readpath import RowMapper, json_response
+from routing import DistanceMatrixCache, plan_route
+from search import (FTS_TABLE, fts, install as install_search_index, match_expression,
+                    rebuild as rebuild_search_index)
+from sharding import ShardRouter, ShardedSession, bind_shard, current_shard
+from simulator import Arrival, ThresholdPolicy, default_scenarios, simulate, sweep, synthetic_arrivals
+from truck_history import (BUCKET_SIZES, status_code, status_name, to_timestamp, split_interval,
+                           cover_range)
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tccs.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your-secret-key'  # Change in production
-db = SQLAlchemy(app)
+app.config['ARCHIVE_DIR'] = os.path.join(app.instance_path, 'archive')
+app.config['ARCHIVE_AFTER_DAYS'] = 90  # Dispatched consignments older than this move to the archive
+app.config['SHARDED'] = os.environ.get('TCCS_SHARDED') == '1'  # One database per branch
+app.config['SHARD_DIR'] = os.path.join(app.instance_path, 'shards')
+app.config['SHARD_WORKERS'] = 8
+app.config['AUTO_DISPATCH_THRESHOLD'] = 500  # Pending m3 per destination that triggers a dispatch
+app.config['ADMISSION_ENABLED'] = True
+app.config['ADMISSION_RATE'] = 20  # Write requests per second per branch
+app.config['ADMISSION_BURST'] = 100
+app.config['ADMISSION_MAX_IN_FLIGHT'] = 4  # Concurrent requests per branch on one write route
+db = SQLAlchemy(app, session_options={'class_': ShardedSession})
 
 # Database Models
 class User(db.Model):
@@ -19,6 +48,7 @@ class User(db.Model):
     password = db.Column(db.String(100), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # Manager or Employee
     branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=True)
+    __table_args__ = (db.Index('ix_user_branch_role', 'branch_id', 'role'),)
 
 class Consignment(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -30,9 +60,14 @@ class Consignment(db.Model):
     receiver_address = db.Column(db.String(200), nullable=False)
     status = db.Column(db.String(50), default='Pending')
     charge = db.Column(db.Float, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    dispatched_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    dispatched_at = db.Column(db.DateTime, nullable=True, index=True)
     branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=True)  # Stable row number, set on insert by the search index trigger
+    __table_args__ = (db.Index('ix_consignment_branch_status', 'branch_id', 'status'),
+                      db.Index('ix_consignment_seq', 'seq', unique=True))
+
+install_search_index(Consignment.__table__)
 
 class Truck(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -40,23 +75,62 @@ class Truck(db.Model):
     status = db.Column(db.String(50), default='Available')
     capacity = db.Column(db.Float, default=500.0)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
-    branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=False)
+    branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=False, index=True)
+    dispatch_version = db.Column(db.Integer, default=0, nullable=False)  # Bumped whenever the manifest changes
 
 class Branch(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     location = db.Column(db.String(100), nullable=False)
 
+class BranchRoute(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    from_branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=False)
+    to_branch_id = db.Column(db.String(36), db.ForeignKey('branch.id'), nullable=False)
+    distance = db.Column(db.Float, nullable=False)  # km, travelled in either direction
+
 class ConsignmentTruck(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    consignment_id = db.Column(db.String(36), db.ForeignKey('consignment.id'))
-    truck_id = db.Column(db.String(36), db.ForeignKey('truck.id'))
+    consignment_id = db.Column(db.String(36), db.ForeignKey('consignment.id'), index=True)
+    truck_id = db.Column(db.String(36), db.ForeignKey('truck.id'), index=True)
 
 class TruckAssignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     truck_id = db.Column(db.String(36), db.ForeignKey('truck.id'), nullable=False)
-    employee_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    employee_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False, index=True)
     assigned_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class TruckEvent(db.Model):
+    __tablename__ = 'truck_events'
+    id = db.Column(db.Integer, primary_key=True)
+    truck_id = db.Column(db.String(36), db.ForeignKey('truck.id'), nullable=False)
+    ts = db.Column(db.Integer, nullable=False)  # epoch seconds (UTC)
+    status = db.Column(db.SmallInteger, nullable=False)  # truck_history.STATUS_CODES
+    location = db.Column(db.String(100), nullable=False)
+    __table_args__ = (db.Index('ix_truck_events_truck_ts', 'truck_id', 'ts'),)
+
+class TruckStatusRollup(db.Model):
+    __tablename__ = 'truck_status_rollups'
+    truck_id = db.Column(db.String(36), db.ForeignKey('truck.id'), primary_key=True)
+    bucket_size = db.Column(db.Integer, primary_key=True)  # truck_history.HOUR or DAY
+    bucket_start = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.SmallInteger, primary_key=True)
+    seconds = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.Index('ix_truck_status_rollups_bucket', 'bucket_size', 'bucket_start'),)
+
+# Branch-scoped tables; users, branches and branch routes stay in the global catalog.
+SHARDED_TABLES = ('consignment', 'truck', 'consignment_truck', 'truck_assignment', 'truck_events',
+                  'truck_status_rollups')
+
+def branch_in_catalog(branch_id):
+    """True if the catalog has a committed branch with this id."""
+    with db.engine.connect() as connection:
+        return connection.execute(select(Branch.id).where(Branch.id == branch_id)).first() is not None
+
+if app.config['SHARDED']:
+    app.extensions['shard_router'] = ShardRouter(
+        app.config['SHARD_DIR'], db.metadata, SHARDED_TABLES, app.config['SHARD_WORKERS'], branch_in_catalog
+    )
+
 # Authentication Decorator
 def login_required(role=None):
     def decorator(f):
@@ -71,6 +145,86 @@ def login_required(role=None):
         return decorated_function
     return decorator
 
+admission = AdmissionController(
+    app.config['ADMISSION_RATE'], app.config['ADMISSION_BURST'], app.config['ADMISSION_MAX_IN_FLIGHT']
+)
+
+def admission_key():
+    """Branch a write request is charged to.
+
+    Employees always write to their own branch. A manager is charged to the
+    body's branch_id when it is a catalog branch, else to their own user, so
+    made-up ids can neither mint fresh buckets nor drain another branch's.
+    """
+    user = db.session.get(User, session['user_id'])
+    if user.role == 'Employee' and user.branch_id:
+        return user.branch_id
+    data = request.get_json(silent=True)
+    branch_id = data.get('branch_id') if isinstance(data, dict) else None
+    if isinstance(branch_id, str) and branch_id and db.session.get(Branch, branch_id):
+        return branch_id
+    return f'user:{user.id}'
+
+def admission_controlled(f):
+    """Shed write requests over the per-branch rate or in-flight limit with a 429."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not app.config['ADMISSION_ENABLED']:
+            return f(*args, **kwargs)
+        route, branch_id = request.endpoint, admission_key()
+        try:
+            admission.acquire(route, branch_id)
+        except Rejected as e:
+            response = jsonify({'error': e.reason})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        try:
+            return f(*args, **kwargs)
+        finally:
+            admission.release(route, branch_id)
+    return decorated_function
+
+# Shard Helpers
+def shard_router():
+    return app.extensions.get('shard_router')
+
+def fan_out(fn, branch_ids=None):
+    """Call fn() once per shard on the shard pool and return the results.
+
+    Unsharded, fn() runs once against the single database.
+    """
+    router = shard_router()
+    if router is None:
+        return [fn()]
+    if branch_ids is None:
+        branch_ids = [branch_id for (branch_id,) in db.session.query(Branch.id).all()]
+    def run(branch_id):
+        with app.app_context():
+            bind_shard(branch_id)
+            try:
+                return fn()
+            finally:
+                db.session.remove()
+    return router.map(run, branch_ids)
+
+def locate_branch(model, id):
+    """Branch of the ``model`` row with this id, or None if it does not exist."""
+    find = lambda: db.session.query(model.branch_id).filter(model.id == id).scalar()
+    return next((branch_id for branch_id in fan_out(find) if branch_id), None)
+
+def bind_shard_of(model, id):
+    """Bind the shard holding the ``model`` row with this id; False if no shard has it."""
+    if shard_router() is None:
+        return True
+    branch_id = locate_branch(model, id)
+    bind_shard(branch_id)
+    return branch_id is not None
+
+@app.before_request
+def reset_shard():
+    bind_shard(None)
+
 # Helper Functions
 def calculate_charge(volume, destination):
     base_rate = 10  # $10 per cubic meter
@@ -85,13 +239,20 @@ def get_truck_volume(truck_id):
     ).scalar() or 0
     return total_volume
 
+def get_truck_volumes(truck_ids):
+    return dict(db.session.query(ConsignmentTruck.truck_id, func.sum(Consignment.volume)).join(
+        Consignment, Consignment.id == ConsignmentTruck.consignment_id
+    ).filter(
+        ConsignmentTruck.truck_id.in_(truck_ids)
+    ).group_by(ConsignmentTruck.truck_id).all())
+
 def check_truck_allocation(destination, branch_id):
     total_volume = db.session.query(func.sum(Consignment.volume)).filter(
         Consignment.destination == destination,
         Consignment.status == 'Pending',
         Consignment.branch_id == branch_id
     ).scalar() or 0
-    if total_volume >= 500:
+    if total_volume >= app.config['AUTO_DISPATCH_THRESHOLD']:
         truck = Truck.query.filter_by(branch_id=branch_id, status='Available').first()
         if truck:
             consignments = Consignment.query.filter_by(destination=destination, status='Pending', branch_id=branch_id).all()
@@ -105,6 +266,277 @@ def check_truck_allocation(destination, branch_id):
             return truck, consignments
     return None, []
 
+def roll_up_truck_status(connection, truck_id, status, start, end):
+    rows = [
+        {'truck_id': truck_id, 'bucket_size': size, 'bucket_start': bucket, 'status': status, 'seconds': seconds}
+        for size in BUCKET_SIZES for bucket, seconds in split_interval(start, end, size)
+    ]
+    if rows:
+        stmt = sqlite_insert(TruckStatusRollup.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['truck_id', 'bucket_size', 'bucket_start', 'status'],
+            set_={'seconds': TruckStatusRollup.__table__.c.seconds + stmt.excluded.seconds}
+        )
+        connection.execute(stmt, rows)
+
+def record_truck_events(session, flush_context):
+    for truck in list(session.new) + list(session.dirty):
+        if not isinstance(truck, Truck):
+            continue
+        attrs = inspect(truck).attrs
+        if truck not in session.new and not (attrs.status.history.has_changes() or attrs.location.history.has_changes()):
+            continue
+        connection = session.connection(bind_arguments={'mapper': TruckEvent})
+        ts = to_timestamp(datetime.utcnow())
+        previous = connection.execute(
+            select(TruckEvent.ts, TruckEvent.status)
+            .where(TruckEvent.truck_id == truck.id)
+            .order_by(TruckEvent.ts.desc(), TruckEvent.id.desc())
+            .limit(1)
+        ).first()
+        if previous:
+            ts = max(ts, previous.ts)
+            roll_up_truck_status(connection, truck.id, previous.status, previous.ts, ts)
+        connection.execute(TruckEvent.__table__.insert().values(
+            truck_id=truck.id, ts=ts, status=status_code(truck.status), location=truck.location
+        ))
+
+event.listen(db.session, 'after_flush', record_truck_events)
+
+def bump_dispatch_versions(session, flush_context, instances):
+    trucks = {obj for obj in session.dirty if isinstance(obj, Truck) and session.is_modified(obj)}
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, ConsignmentTruck):
+                truck = session.get(Truck, obj.truck_id)
+                if truck is not None and truck not in session.new:
+                    trucks.add(truck)
+    for truck in trucks:
+        truck.dispatch_version = (truck.dispatch_version or 0) + 1
+
+event.listen(db.session, 'before_flush', bump_dispatch_versions)
+
+def truck_status_seconds(start, end, branch_id=None):
+    """Seconds each truck spent in each status code over the hour-aligned [start, end)."""
+    start, end, ranges = cover_range(start, end)
+    totals = defaultdict(lambda: defaultdict(int))
+    if not ranges:
+        return start, end, totals
+    query = db.session.query(
+        TruckStatusRollup.truck_id, TruckStatusRollup.status, func.sum(TruckStatusRollup.seconds)
+    ).filter(or_(*[
+        and_(TruckStatusRollup.bucket_size == size,
+             TruckStatusRollup.bucket_start >= first,
+             TruckStatusRollup.bucket_start < last)
+        for size, first, last in ranges
+    ]))
+    if branch_id:
+        query = query.join(Truck, Truck.id == TruckStatusRollup.truck_id).filter(Truck.branch_id == branch_id)
+    for truck_id, status, seconds in query.group_by(TruckStatusRollup.truck_id, TruckStatusRollup.status):
+        totals[truck_id][status] += seconds
+    # Time since each truck's latest event is not rolled up until its next change.
+    latest_id = select(TruckEvent.id).where(TruckEvent.truck_id == Truck.id).order_by(
+        TruckEvent.ts.desc(), TruckEvent.id.desc()
+    ).limit(1).correlate(Truck).scalar_subquery()
+    query = db.session.query(Truck.id, TruckEvent.ts, TruckEvent.status).join(
+        TruckEvent, TruckEvent.id == latest_id
+    ).filter(TruckEvent.ts < end)
+    if branch_id:
+        query = query.filter(Truck.branch_id == branch_id)
+    now = to_timestamp(datetime.utcnow())
+    for truck_id, ts, status in query:
+        seconds = min(end, now) - max(start, ts)
+        if seconds > 0:
+            totals[truck_id][status] += seconds
+    return start, end, totals
+
+def parse_time_range(args, default_days=30):
+    end = datetime.fromisoformat(args['end']) if args.get('end') else datetime.utcnow()
+    if args.get('start'):
+        start = datetime.fromisoformat(args['start'])
+    else:
+        start = end - timedelta(days=int(args.get('days', default_days)))
+    return to_timestamp(start), to_timestamp(end)
+
+_archive_stores = {}
+
+def get_archive():
+    root = app.config['ARCHIVE_DIR']
+    if root not in _archive_stores:
+        _archive_stores[root] = ArchiveStore(root)
+    return _archive_stores[root]
+
+def archive_consignments(older_than_days=None, batch_size=5000):
+    if older_than_days is None:
+        older_than_days = app.config['ARCHIVE_AFTER_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archive = get_archive()
+    def archive_shard():
+        total = 0
+        while True:
+            rows = db.session.query(Consignment, ConsignmentTruck.truck_id).outerjoin(
+                ConsignmentTruck, ConsignmentTruck.consignment_id == Consignment.id
+            ).filter(
+                Consignment.status == 'Dispatched',
+                Consignment.dispatched_at < cutoff
+            ).order_by(Consignment.dispatched_at, Consignment.branch_id).limit(batch_size).all()
+            if not rows:
+                return total
+            ids = archive.append([{
+                'id': c.id,
+                'volume': c.volume,
+                'charge': c.charge,
+                'created_at': to_timestamp(c.created_at),
+                'dispatched_at': to_timestamp(c.dispatched_at),
+                'destination': c.destination,
+                'status': c.status,
+                'truck_id': truck_id,
+                'sender_name': c.sender_name,
+                'sender_address': c.sender_address,
+                'receiver_name': c.receiver_name,
+                'receiver_address': c.receiver_address,
+                'branch_id': c.branch_id
+            } for c, truck_id in rows])
+            ConsignmentTruck.query.filter(ConsignmentTruck.consignment_id.in_(ids)).delete(synchronize_session=False)
+            Consignment.query.filter(Consignment.id.in_(ids)).delete(synchronize_session=False)
+            Truck.query.filter(Truck.id.in_({truck_id for _, truck_id in rows if truck_id})).update(
+                {Truck.dispatch_version: Truck.dispatch_version + 1}, synchronize_session=False
+            )
+            db.session.commit()
+            total += len(set(ids))
+    return sum(fan_out(archive_shard))
+
+@app.cli.command('archive-consignments')
+@click.option('--days', type=int, default=None, help='Archive consignments dispatched more than this many days ago.')
+def archive_consignments_command(days):
+    count = archive_consignments(days)
+    click.echo(f'Archived {count} consignments to {app.config["ARCHIVE_DIR"]}')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    def rebuild_shard():
+        rebuild_search_index(db.session.connection(bind_arguments={'mapper': Consignment}))
+        db.session.commit()
+    fan_out(rebuild_shard)
+    click.echo('Rebuilt consignment search index')
+
+def load_arrivals(days):
+    """Consignments booked in the last ``days`` days, live and archived, as simulator arrivals."""
+    since = datetime.utcnow() - timedelta(days=days)
+    def shard_arrivals():
+        return [Arrival(to_timestamp(created_at), branch_id, destination, volume)
+                for created_at, branch_id, destination, volume in db.session.execute(
+                    select(Consignment.created_at, Consignment.branch_id, Consignment.destination, Consignment.volume)
+                    .where(Consignment.created_at >= since)
+                )]
+    arrivals = list(chain.from_iterable(fan_out(shard_arrivals)))
+    cutoff = to_timestamp(since)
+    for partition in get_archive().partitions(since=cutoff):
+        created = partition.column('created_at')
+        mask = created >= cutoff
+        destinations = partition.dictionaries['destination']
+        arrivals.extend(
+            Arrival(int(t), partition.branch_id, destinations[code], float(v))
+            for t, code, v in zip(created[mask], partition.column('destination')[mask], partition.column('volume')[mask])
+        )
+    arrivals.sort()
+    return arrivals
+
+@app.cli.command('simulate-dispatch')
+@click.option('--days', type=int, default=30, help='Replay consignments booked in the last this many days.')
+@click.option('--synthetic', is_flag=True, help='Replay a synthetic arrival stream instead of the database.')
+@click.option('--workers', type=int, default=None, help='Sweep processes (default: one per CPU).')
+@click.option('--top', type=int, default=10, help='Number of scenarios to print.')
+def simulate_dispatch_command(days, synthetic, workers, top):
+    arrivals = synthetic_arrivals(days=days) if synthetic else load_arrivals(days)
+    if not arrivals:
+        click.echo('No consignments to replay')
+        return
+    # check_truck_allocation only runs when a consignment is booked, not when a truck comes back.
+    baseline = simulate(arrivals, ThresholdPolicy(app.config['AUTO_DISPATCH_THRESHOLD'], arrivals_only=True))
+    results = sweep(arrivals, default_scenarios(), workers)
+    # Fewest stranded consignments first, then shortest waits, then busiest trucks.
+    results.sort(key=lambda r: (r['pending_at_end'], r['avg_waiting_time_hours'], -r['utilization']))
+    click.echo(f'Replayed {len(arrivals)} consignments through {len(results)} scenarios (first row: current policy, '
+               f'which checks only on new bookings; "recheck" rows also check when a truck returns)')
+    click.echo(f'{"policy":<10} {"params":<34} {"trucks":>6} {"trip h":>6} {"wait h":>7} {"p95 h":>7} '
+               f'{"idle h":>8} {"util":>5} {"load":>5} {"over":>5} {"pending":>7}')
+    for r in [baseline] + results[:top]:
+        params = ' '.join(f'{key}={r[key]:g}' for key in ('threshold', 'max_wait_hours', 'fill')
+                          if r.get(key) is not None)
+        if r.get('arrivals_only') is False:
+            params += ' recheck'
+
+        click.echo(f'{r["policy"]:<10} {params:<34} {r["trucks_per_branch"]:>6} {r["trip_hours"]:>6g} '
+                   f'{r["avg_waiting_time_hours"]:>7.1f} {r["p95_waiting_time_hours"]:>7.1f} '
+                   f'{r["avg_idle_time_hours"]:>8.1f} {r["utilization"]:>5.2f} {r["avg_load_factor"]:>5.2f} '
+                   f'{r["overloaded_trips"]:>5} {r["pending_at_end"]:>7}')
+
+cube = ConsignmentCube()
+CUBE_REFRESH_GRACE = timedelta(seconds=5)  # Re-read rows committed slightly out of timestamp order
+
+def refresh_cube(batch_size=50000):
+    # New rows are found by seq so back-dated created_at values are not missed;
+    # status changes are found by dispatched_at.
+    def load_shard(since, last_seqs):
+        query = select(
+            Consignment.seq, Consignment.id, Consignment.branch_id, Consignment.destination, Consignment.status,
+            Consignment.created_at, Consignment.volume, Consignment.charge
+        ).select_from(Consignment)
+        if since is not None:
+            query = query.where(or_(Consignment.seq > last_seqs.get(current_shard(), 0),
+                                    Consignment.dispatched_at >= since))
+        return current_shard(), db.session.execute(query).all()
+    with cube.lock:
+        refreshed_at = datetime.utcnow()
+        if cube.watermark is None:
+            since = None
+            for partition in get_archive().partitions():
+                cube.add(
+                    partition.strings('id'),
+                    [partition.branch_id] * partition.rows,
+                    np.array(partition.dictionaries['destination'], dtype=object)[partition.column('destination')],
+                    np.array(partition.dictionaries['status'], dtype=object)[partition.column('status')],
+                    partition.column('created_at') // 86400,
+                    partition.column('volume'),
+                    partition.column('charge')
+                )
+        else:
+            since = cube.watermark - CUBE_REFRESH_GRACE
+        epoch = datetime(1970, 1, 1)
+        last_seqs = dict(cube.last_seqs)
+        for shard, rows in fan_out(lambda: load_shard(since, last_seqs)):
+            for offset in range(0, len(rows), batch_size):
+                batch = rows[offset:offset + batch_size]
+                seqs, ids, branch, destination, status, created_at, volume, charge = zip(*batch)
+                cube.add(ids, branch, destination, status, [(c - epoch).days for c in created_at], volume, charge)
+                cube.last_seqs[shard] = max(cube.last_seqs.get(shard, 0), max(seqs))
+        cube.watermark = refreshed_at
+
+def load_branch_graph():
+    branch_ids = [branch_id for (branch_id,) in db.session.query(Branch.id).all()]
+    edges = db.session.query(BranchRoute.from_branch_id, BranchRoute.to_branch_id, BranchRoute.distance).all()
+    return branch_ids, edges
+
+distance_cache = DistanceMatrixCache(load_branch_graph)
+
+# The cache is invalidated once the change is committed; invalidating at flush
+# time would let a concurrent request rebuild it from the old committed graph.
+def note_branch_graph_change(session, flush_context, instances):
+    if any(isinstance(obj, (Branch, BranchRoute)) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['branch_graph_changed'] = True
+
+def invalidate_distance_cache(session):
+    if session.info.pop('branch_graph_changed', False):
+        distance_cache.invalidate()
+
+def forget_branch_graph_change(session):
+    session.info.pop('branch_graph_changed', None)
+
+event.listen(db.session, 'before_flush', note_branch_graph_change)
+event.listen(db.session, 'after_commit', invalidate_distance_cache)
+event.listen(db.session, 'after_rollback', forget_branch_graph_change)
+
 # Routes
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -133,17 +565,21 @@ def dashboard():
 
 @app.route('/consignments', methods=['POST'])
 @login_required()
+@admission_controlled
 def add_consignment():
     user = db.session.get(User, session['user_id'])
     data = request.json
     branch_id = user.branch_id if user.role == 'Employee' else data.get('branch_id')
     if not branch_id:
         return jsonify({'error': 'Branch ID required'}), 400
+    if not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
     try:
         volume = float(data['volume'])
     except (ValueError, TypeError):
         return jsonify({'error': 'Invalid volume value'}), 400
     charge = calculate_charge(volume, data['destination'])
+    bind_shard(branch_id)
     consignment = Consignment(
         volume=volume,
         destination=data['destination'],
@@ -165,28 +601,83 @@ def add_consignment():
         }), 201
     return jsonify({'message': 'Consignment added'}), 201
 
+# Read routes run lambda statements, whose construction and compiled SQL are
+# cached by SQLAlchemy, and serialize the plain row tuples through a RowMapper.
+consignment_rows = RowMapper('id', 'volume', 'destination', 'status', 'charge', 'created_at', 'branch_id')
+
+def list_consignments(branch_id=None):
+    stmt = lambda_stmt(lambda: select(
+        Consignment.id, Consignment.volume, Consignment.destination, Consignment.status,
+        Consignment.charge, Consignment.created_at, Consignment.branch_id
+    ))
+    if branch_id:
+        stmt += lambda s: s.where(Consignment.branch_id == branch_id)
+    return consignment_rows.all(db.session.execute(stmt))
+
 @app.route('/consignments', methods=['GET'])
 @login_required()
 def get_consignments():
     user = db.session.get(User, session['user_id'])
-    query = Consignment.query
     if user.role == 'Employee':
-        query = query.filter_by(branch_id=user.branch_id)
-    consignments = query.all()
-    return jsonify([{
-        'id': c.id,
-        'volume': c.volume,
-        'destination': c.destination,
-        'status': c.status,
-        'charge': c.charge,
-        'created_at': c.created_at.isoformat(),
-        'branch_id': c.branch_id
-    } for c in consignments])
+        bind_shard(user.branch_id)
+        return json_response(list_consignments(user.branch_id))
+    return json_response(list(chain.from_iterable(fan_out(list_consignments))))
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+search_rows = RowMapper(
+    'id', 'sender_name', 'sender_address', 'receiver_name', 'receiver_address', 'destination', 'status',
+    'volume', 'created_at', 'branch_id', 'rank'
+)
+
+def consignment_search_stmt(match, branch_id, limit):
+    """Best ``limit`` matches for an FTS5 ``match`` expression, best (lowest) rank first."""
+    stmt = select(
+        Consignment.id, Consignment.sender_name, Consignment.sender_address, Consignment.receiver_name,
+        Consignment.receiver_address, Consignment.destination, Consignment.status, Consignment.volume,
+        Consignment.created_at, Consignment.branch_id, fts.c.rank
+    ).select_from(fts).join(
+        Consignment, Consignment.seq == fts.c.rowid
+    ).where(fts.c[FTS_TABLE].op('MATCH')(match))
+    if branch_id:
+        stmt = stmt.where(Consignment.branch_id == branch_id)
+    return stmt.order_by(fts.c.rank).limit(limit)
+
+def search_consignments(match, branch_id, limit):
+    return search_rows.all(db.session.execute(consignment_search_stmt(match, branch_id, limit)))
+
+@app.route('/consignments/search', methods=['GET'])
+@login_required()
+def consignment_search():
+    q = request.args.get('q', '').strip()
+    match = match_expression(q)
+    if not match:
+        return jsonify({'error': 'Search query required'}), 400
+    limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    user = db.session.get(User, session['user_id'])
+    branch_id = user.branch_id if user.role == 'Employee' else request.args.get('branch_id')
+    if branch_id and not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    window = offset + limit + 1
+    if branch_id:
+        bind_shard(branch_id)
+        rows = search_consignments(match, branch_id, window)
+    else:
+        rows = sorted(chain.from_iterable(fan_out(lambda: search_consignments(match, None, window))),
+                      key=lambda row: row['rank'])
+    return json_response({
+        'query': q,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if len(rows) > offset + limit else None,
+        'results': rows[offset:offset + limit]
+    })
 
 @app.route('/consignments/<id>', methods=['GET'])
 @login_required()
 def get_consignment(id):
-    consignment = db.session.get(Consignment, id)
+    consignment = db.session.get(Consignment, id) if bind_shard_of(Consignment, id) else None
     if not consignment:
         return jsonify({'error': 'Consignment not found'}), 404
     user = db.session.get(User, session['user_id'])
@@ -202,14 +693,17 @@ def get_consignment(id):
 
 @app.route('/consignments/assign', methods=['POST'])
 @login_required(role='Manager')
+@admission_controlled
 def assign_consignment():
     data = request.json
     consignment_id = data.get('consignment_id')
     truck_id = data.get('truck_id')
     if not consignment_id or not truck_id:
         return jsonify({'error': 'Consignment ID and Truck ID required'}), 400
-    consignment = db.session.get(Consignment, consignment_id)
-    truck = db.session.get(Truck, truck_id)
+    consignment = db.session.get(Consignment, consignment_id) if bind_shard_of(Consignment, consignment_id) else None
+    truck = db.session.get(Truck, truck_id) if consignment else None
+    if consignment and not truck and shard_router() and locate_branch(Truck, truck_id):
+        return jsonify({'error': 'Consignment and truck must be in the same branch'}), 400
     if not consignment or not truck:
         return jsonify({'error': 'Invalid consignment or truck ID'}), 404
     if consignment.status != 'Pending':
@@ -227,38 +721,177 @@ def assign_consignment():
     db.session.commit()
     return jsonify({'message': 'Consignment assigned to truck successfully'}), 201
 
+truck_rows = RowMapper('id', 'location', 'status', 'last_updated', 'branch_id')
+truck_consignment_rows = RowMapper('id', 'volume', 'destination')
+
+def list_trucks(branch_id=None):
+    stmt = lambda_stmt(lambda: select(Truck.id, Truck.location, Truck.status, Truck.last_updated, Truck.branch_id))
+    loaded = lambda_stmt(lambda: select(
+        ConsignmentTruck.truck_id, Consignment.id, Consignment.volume, Consignment.destination
+    ).join(Consignment, Consignment.id == ConsignmentTruck.consignment_id).join(
+        Truck, Truck.id == ConsignmentTruck.truck_id
+    ))
+    if branch_id:
+        stmt += lambda s: s.where(Truck.branch_id == branch_id)
+        loaded += lambda s: s.where(Truck.branch_id == branch_id)
+    consignments = defaultdict(list)
+    for row in db.session.execute(loaded):
+        consignments[row[0]].append(truck_consignment_rows.one(row[1:]))
+    truck_data = truck_rows.all(db.session.execute(stmt))
+    for truck in truck_data:
+        loaded_consignments = consignments.get(truck['id'], [])
+        truck['volume'] = sum(c['volume'] for c in loaded_consignments)
+        truck['consignments'] = loaded_consignments
+    return truck_data
+
+BATCH_MODES = ('all_or_nothing', 'best_effort')
+MAX_BATCH_SIZE = 1000
+TRUCK_NOT_IN_SHARD = object()
+
+def parse_batch(data, keys, missing_error):
+    """Validate a batch request body; returns (mode, per-item results, error response)."""
+    items = data.get('assignments') if isinstance(data, dict) else None
+    mode = data.get('mode', 'all_or_nothing') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, None, (jsonify({'error': 'assignments list required'}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, None, (jsonify({'error': f'At most {MAX_BATCH_SIZE} assignments per batch'}), 400)
+    if mode not in BATCH_MODES:
+        return None, None, (jsonify({'error': f'mode must be one of: {", ".join(BATCH_MODES)}'}), 400)
+    results = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        result = {key: item.get(key) for key in keys}
+        result['error'] = None if all(isinstance(value, str) and value for value in result.values()) else missing_error
+        results.append(result)
+    return mode, results, None
+
+def finish_shard(errors, pending, scope):
+    """Commit or roll back a shard's batch work; returns ``(errors by index, committed)``.
+
+    ``scope`` is ``'valid'`` to commit whatever validated, ``'shard'`` to commit
+    only if every item in this shard validated, and ``'batch'`` to also require
+    that this shard holds every item of the batch.
+    """
+    ok = all(error is None for error in errors.values())
+    if errors and (scope == 'valid' or (ok and (scope == 'shard' or len(errors) == len(pending)))):
+        db.session.commit()
+        return errors, True
+    db.session.rollback()
+    return errors, False
+
+def run_batch(results, mode, apply_shard, not_found_error, resolve_foreign=None):
+    """Run ``apply_shard`` on every shard and fold its outcome into ``results``.
+
+    ``apply_shard(pending, scope)`` validates and applies the items whose
+    primary row lives in the bound shard and returns ``finish_shard``'s
+    ``(errors by index, committed)``; an error of ``TRUCK_NOT_IN_SHARD`` is
+    passed to ``resolve_foreign(items)`` to be turned into messages once every
+    shard has answered. All-or-nothing batches are committed by a shard only
+    when it holds every item; batches spanning several shards are applied
+    shard by shard in a second pass once every item has validated. Shards
+    cannot commit together, so if a row changed in between, the items of the
+    shards that did commit are still reported as assigned. An all-or-nothing
+    batch with a malformed item is rejected before any shard sees it.
+    """
+    pending = [(index, r) for index, r in enumerate(results) if r['error'] is None]
+    if mode == 'all_or_nothing' and len(pending) < len(results):
+        for result in results:
+            result['status'] = 'error' if result['error'] else 'skipped'
+        return jsonify({'mode': mode, 'assigned': 0, 'results': results}), 400
+    outcomes = fan_out(lambda: apply_shard(pending, 'valid' if mode == 'best_effort' else 'batch'))
+    claimed = {}
+    for errors, _ in outcomes:
+        claimed.update(errors)
+    for index, result in pending:
+        result['error'] = claimed.get(index, not_found_error)
+    foreign = [r for r in results if r['error'] is TRUCK_NOT_IN_SHARD]
+    if foreign:
+        resolve_foreign(foreign)
+    if mode == 'all_or_nothing' and not any(r['error'] for r in results) and not any(c for _, c in outcomes):
+        outcomes = fan_out(lambda: apply_shard(pending, 'shard'))
+        for errors, _ in outcomes:
+            for index, error in errors.items():
+                results[index]['error'] = error
+    assigned = {index for errors, committed in outcomes if committed
+                for index, error in errors.items() if error is None}
+    for index, result in enumerate(results):
+        result['status'] = 'error' if result['error'] else ('assigned' if index in assigned else 'skipped')
+    failed = any(r['error'] for r in results)
+    status = 201 if not failed else (400 if mode == 'all_or_nothing' else 200)
+    return jsonify({'mode': mode, 'assigned': len(assigned), 'results': results}), status
+
+def apply_consignment_batch(pending, scope):
+    consignment_ids = {r['consignment_id'] for _, r in pending}
+    truck_ids = {r['truck_id'] for _, r in pending}
+    consignments = {c.id: c for c in Consignment.query.filter(Consignment.id.in_(consignment_ids))}
+    trucks = {t.id: t for t in Truck.query.filter(Truck.id.in_(truck_ids))}
+    volumes = get_truck_volumes(list(trucks))
+    errors = {}
+    for index, r in pending:
+        consignment = consignments.get(r['consignment_id'])
+        if not consignment:
+            continue
+        truck = trucks.get(r['truck_id'])
+        if not truck:
+            errors[index] = TRUCK_NOT_IN_SHARD
+        elif consignment.status != 'Pending':
+            errors[index] = 'Consignment must be in Pending status'
+        elif consignment.branch_id != truck.branch_id:
+            errors[index] = 'Consignment and truck must be in the same branch'
+        elif volumes.get(truck.id, 0) + consignment.volume > 500:
+            errors[index] = 'Assigning this consignment would exceed truck capacity (500 cubic meters)'
+        else:
+            errors[index] = None
+            volumes[truck.id] = volumes.get(truck.id, 0) + consignment.volume
+            consignment.status = 'Dispatched'
+            consignment.dispatched_at = datetime.utcnow()
+            truck.status = 'In-Transit'
+            truck.last_updated = datetime.utcnow()
+            db.session.add(ConsignmentTruck(consignment_id=consignment.id, truck_id=truck.id))
+    return finish_shard(errors, pending, scope)
+
+def apply_truck_batch(pending, employees, scope):
+    trucks = {t.id: t for t in Truck.query.filter(Truck.id.in_({r['truck_id'] for _, r in pending}))}
+    volumes = get_truck_volumes(list(trucks))
+    errors = {}
+    for index, r in pending:
+        truck = trucks.get(r['truck_id'])
+        if not truck:
+            continue
+        employee = employees.get(r['employee_id'])
+        if not employee:
+            errors[index] = 'Invalid truck or employee ID'
+        elif employee['role'] != 'Employee':
+            errors[index] = 'Can only assign to employees'
+        elif truck.branch_id != employee['branch_id']:
+            errors[index] = 'Truck and employee must be in the same branch'
+        elif volumes.get(truck.id, 0) >= 500:
+            errors[index] = 'Truck volume exceeds 500 cubic meters'
+        else:
+            errors[index] = None
+            db.session.add(TruckAssignment(truck_id=truck.id, employee_id=r['employee_id']))
+    return finish_shard(errors, pending, scope)
+
 @app.route('/trucks', methods=['GET'])
 @login_required()
 def get_trucks():
     user = db.session.get(User, session['user_id'])
-    query = Truck.query
     if user.role == 'Employee':
-        query = query.filter_by(branch_id=user.branch_id)
-    trucks = query.all()
-    truck_data = []
-    for truck in trucks:
-        consignments = Consignment.query.join(ConsignmentTruck).filter(
-            ConsignmentTruck.truck_id == truck.id
-        ).all()
-        truck_data.append({
-            'id': truck.id,
-            'location': truck.location,
-            'status': truck.status,
-            'last_updated': truck.last_updated.isoformat(),
-            'volume': get_truck_volume(truck.id),
-            'consignments': [{'id': c.id, 'volume': c.volume, 'destination': c.destination} for c in consignments],
-            'branch_id': truck.branch_id
-        })
-    return jsonify(truck_data)
+        bind_shard(user.branch_id)
+        return json_response(list_trucks(user.branch_id))
+    return json_response(list(chain.from_iterable(fan_out(list_trucks))))
 
 @app.route('/trucks', methods=['POST'])
 @login_required(role='Manager')
+@admission_controlled
 def add_truck():
     data = request.json
     if not data.get('location') or not data.get('branch_id'):
         return jsonify({'error': 'Location and branch_id required'}), 400
     if not db.session.get(Branch, data['branch_id']):
         return jsonify({'error': 'Invalid branch_id'}), 400
+    bind_shard(data['branch_id'])
     truck = Truck(
         location=data['location'],
         branch_id=data['branch_id']
@@ -269,13 +902,14 @@ def add_truck():
 
 @app.route('/trucks/assign', methods=['POST'])
 @login_required(role='Manager')
+@admission_controlled
 def assign_truck():
     data = request.json
     truck_id = data.get('truck_id')
     employee_id = data.get('employee_id')
     if not truck_id or not employee_id:
         return jsonify({'error': 'Truck ID and Employee ID required'}), 400
-    truck = db.session.get(Truck, truck_id)
+    truck = db.session.get(Truck, truck_id) if bind_shard_of(Truck, truck_id) else None
     employee = db.session.get(User, employee_id)
     if not truck or not employee:
         return jsonify({'error': 'Invalid truck or employee ID'}), 404
@@ -291,79 +925,461 @@ def assign_truck():
     db.session.commit()
     return jsonify({'message': 'Truck assigned successfully'}), 201
 
+@app.route('/consignments/assign/batch', methods=['POST'])
+@login_required(role='Manager')
+@admission_controlled
+def assign_consignments_batch():
+    mode, results, error = parse_batch(
+        request.json, ('consignment_id', 'truck_id'), 'Consignment ID and Truck ID required'
+    )
+    if error:
+        return error
+    def resolve_foreign(foreign):
+        # Sharded: the truck may live in another branch's database.
+        truck_ids = {r['truck_id'] for r in foreign}
+        find = lambda: [t for (t,) in db.session.query(Truck.id).filter(Truck.id.in_(truck_ids))]
+        existing = set(chain.from_iterable(fan_out(find)))
+        for r in foreign:
+            r['error'] = ('Consignment and truck must be in the same branch' if r['truck_id'] in existing
+                          else 'Invalid consignment or truck ID')
+    return run_batch(results, mode, apply_consignment_batch, 'Invalid consignment or truck ID', resolve_foreign)
+
+@app.route('/trucks/assign/batch', methods=['POST'])
+@login_required(role='Manager')
+@admission_controlled
+def assign_trucks_batch():
+    mode, results, error = parse_batch(
+        request.json, ('truck_id', 'employee_id'), 'Truck ID and Employee ID required'
+    )
+    if error:
+        return error
+    employee_ids = {r['employee_id'] for r in results if r['error'] is None}
+    employees = {e.id: {'role': e.role, 'branch_id': e.branch_id}
+                 for e in User.query.filter(User.id.in_(employee_ids))}
+    apply_shard = lambda pending, scope: apply_truck_batch(pending, employees, scope)
+    return run_batch(results, mode, apply_shard, 'Invalid truck or employee ID')
+
+ROUTE_DISTANCE_DECIMALS = 3  # Metres; hides float noise from summed legs
+
+@app.route('/trucks/<id>/route', methods=['GET'])
+@login_required()
+def get_truck_route(id):
+    truck = db.session.get(Truck, id) if bind_shard_of(Truck, id) else None
+    if not truck:
+        return jsonify({'error': 'Truck not found'}), 404
+    user = db.session.get(User, session['user_id'])
+    if user.role == 'Employee' and truck.branch_id != user.branch_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    branch_by_location = dict(db.session.query(Branch.location, Branch.id).all())
+    start_id = branch_by_location.get(truck.location, truck.branch_id)
+    consignments = Consignment.query.join(ConsignmentTruck).filter(
+        ConsignmentTruck.truck_id == truck.id,
+        Consignment.status == 'Dispatched'
+    ).all()
+    by_branch, unknown = {}, {}
+    for c in consignments:
+        branch_id = branch_by_location.get(c.destination)
+        if branch_id:
+            by_branch.setdefault(branch_id, []).append(c.id)
+        else:
+            unknown.setdefault(c.destination, []).append(c.id)
+    matrix = distance_cache.get()
+    order, unreachable = plan_route(matrix, start_id, list(by_branch))
+    locations = {branch_id: location for location, branch_id in branch_by_location.items()}
+    stops, current, total_distance = [], start_id, 0.0
+    for branch_id in order:
+        leg_distance = matrix.distance(current, branch_id)
+        total_distance += leg_distance
+        stops.append({
+            'branch_id': branch_id,
+            'location': locations.get(branch_id),
+            'leg_distance': round(leg_distance, ROUTE_DISTANCE_DECIMALS),
+            'path': matrix.path(current, branch_id),
+            'consignments': by_branch[branch_id]
+        })
+        current = branch_id
+    unroutable = [{'destination': locations.get(b), 'consignments': by_branch[b]} for b in unreachable]
+    unroutable += [{'destination': d, 'consignments': ids} for d, ids in unknown.items()]
+    return jsonify({
+        'truck_id': truck.id,
+        'start_branch_id': start_id,
+        'stops': stops,
+        'total_distance': round(total_distance, ROUTE_DISTANCE_DECIMALS),
+        'unroutable': unroutable
+    })
+
+@app.route('/trucks/<id>/history', methods=['GET'])
+@login_required()
+def get_truck_history(id):
+    truck = db.session.get(Truck, id) if bind_shard_of(Truck, id) else None
+    if not truck:
+        return jsonify({'error': 'Truck not found'}), 404
+    user = db.session.get(User, session['user_id'])
+    if user.role == 'Employee' and truck.branch_id != user.branch_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    try:
+        start, end = parse_time_range(request.args, default_days=1)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid time range'}), 400
+    # Include the last event before the range so the trace starts in a known state.
+    before = TruckEvent.query.filter(TruckEvent.truck_id == id, TruckEvent.ts < start).order_by(
+        TruckEvent.ts.desc(), TruckEvent.id.desc()
+    ).first()
+    events = TruckEvent.query.filter(
+        TruckEvent.truck_id == id, TruckEvent.ts >= start, TruckEvent.ts <= end
+    ).order_by(TruckEvent.ts, TruckEvent.id).all()
+    if before:
+        events.insert(0, before)
+    return jsonify({
+        'truck_id': id,
+        'events': [{
+            'timestamp': datetime.utcfromtimestamp(e.ts).isoformat(),
+            'status': status_name(e.status),
+            'location': e.location
+        } for e in events]
+    })
+
+manifest_cache = ManifestCache()
+MANIFEST_CHUNK = 50
+manifest_truck_rows = RowMapper('id', 'location', 'status', 'capacity', 'dispatch_version', 'branch_id')
+manifest_consignment_rows = RowMapper(
+    'id', 'sender_name', 'sender_address', 'receiver_name', 'receiver_address', 'destination', 'volume', 'charge',
+    'dispatched_at'
+)
+
+def manifest_trucks(*criteria):
+    return manifest_truck_rows.all(db.session.execute(
+        select(Truck.id, Truck.location, Truck.status, Truck.capacity, Truck.dispatch_version, Truck.branch_id)
+        .where(*criteria).order_by(Truck.id)
+    ))
+
+def render_manifests(trucks, branch, format):
+    """Yield each truck's rendered manifest, loading the cache misses of every chunk in one query."""
+    for offset in range(0, len(trucks), MANIFEST_CHUNK):
+        chunk = trucks[offset:offset + MANIFEST_CHUNK]
+        rendered = {}
+        for truck in chunk:
+            rendered[truck['id']] = manifest_cache.get((truck['id'], truck['dispatch_version'], format))
+        missing = [truck_id for truck_id, body in rendered.items() if body is None]
+        consignments = defaultdict(list)
+        if missing:
+            for row in db.session.execute(select(
+                ConsignmentTruck.truck_id, Consignment.id, Consignment.sender_name, Consignment.sender_address,
+                Consignment.receiver_name, Consignment.receiver_address, Consignment.destination,
+                Consignment.volume, Consignment.charge, Consignment.dispatched_at
+            ).join(Consignment, Consignment.id == ConsignmentTruck.consignment_id).where(
+                ConsignmentTruck.truck_id.in_(missing)
+            ).order_by(ConsignmentTruck.id)):
+                consignments[row[0]].append(manifest_consignment_rows.one(row[1:]))
+        for truck in chunk:
+            body = rendered[truck['id']]
+            if body is None:
+                body = render_manifest(format, truck, branch, consignments[truck['id']])
+                manifest_cache.put((truck['id'], truck['dispatch_version'], format), body)
+            yield body
+
+def manifest_format():
+    format = request.args.get('format', 'text')
+    return format if format in MANIFEST_FORMATS else None
+
+@app.route('/trucks/<id>/manifest', methods=['GET'])
+@login_required()
+def get_truck_manifest(id):
+    format = manifest_format()
+    if not format:
+        return jsonify({'error': f'format must be one of: {", ".join(MANIFEST_FORMATS)}'}), 400
+    trucks = manifest_trucks(Truck.id == id) if bind_shard_of(Truck, id) else []
+    if not trucks:
+        return jsonify({'error': 'Truck not found'}), 404
+    user = db.session.get(User, session['user_id'])
+    if user.role == 'Employee' and trucks[0]['branch_id'] != user.branch_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    branch = db.session.get(Branch, trucks[0]['branch_id'])
+    body = b''.join(render_manifests(trucks, branch.location, format))
+    if format == 'html':
+        body = html_head(f'Manifest {id}') + body + HTML_TAIL
+    return Response(body, content_type=MANIFEST_FORMATS[format])
+
+@app.route('/manifests', methods=['GET'])
+@login_required()
+def get_manifests():
+    format = manifest_format()
+    if not format:
+        return jsonify({'error': f'format must be one of: {", ".join(MANIFEST_FORMATS)}'}), 400
+    user = db.session.get(User, session['user_id'])
+    branch_id = user.branch_id if user.role == 'Employee' else request.args.get('branch_id')
+    if not branch_id:
+        return jsonify({'error': 'Branch ID required'}), 400
+    branch = db.session.get(Branch, branch_id)
+    if not branch:
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    try:
+        day = datetime.fromisoformat(request.args['date']) if request.args.get('date') else datetime.utcnow()
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    location = branch.location
+    def generate():
+        # Trucks that had a consignment dispatched on the day, one manifest each.
+        bind_shard(branch_id)
+        dispatched = select(ConsignmentTruck.truck_id).join(
+            Consignment, Consignment.id == ConsignmentTruck.consignment_id
+        ).where(Consignment.dispatched_at >= start, Consignment.dispatched_at < start + timedelta(days=1))
+        trucks = manifest_trucks(Truck.branch_id == branch_id, Truck.id.in_(dispatched))
+        if format == 'html':
+            yield html_head(f'Manifests {location} {start.date().isoformat()}')
+        yield from render_manifests(trucks, location, format)
+        if format == 'html':
+            yield HTML_TAIL
+    return Response(stream_with_context(generate()), content_type=MANIFEST_FORMATS[format])
+
+assigned_truck_rows = RowMapper('id', 'location', 'status', 'assigned_at')
+
 @app.route('/trucks/assigned', methods=['GET'])
 @login_required(role='Employee')
 def get_assigned_trucks():
     user = db.session.get(User, session['user_id'])
-    assignments = TruckAssignment.query.filter_by(employee_id=user.id).all()
-    trucks = []
-    for assignment in assignments:
-        truck = db.session.get(Truck, assignment.truck_id)
-        if truck:
-            trucks.append({
-                'id': truck.id,
-                'location': truck.location,
-                'status': truck.status,
-                'volume': get_truck_volume(truck.id),
-                'assigned_at': assignment.assigned_at.isoformat()
-            })
-    return jsonify(trucks)
+    bind_shard(user.branch_id)
+    employee_id = user.id
+    stmt = lambda_stmt(lambda: select(
+        Truck.id, Truck.location, Truck.status, TruckAssignment.assigned_at
+    ).join(Truck, Truck.id == TruckAssignment.truck_id).where(
+        TruckAssignment.employee_id == employee_id
+    ).order_by(TruckAssignment.id))
+    trucks = assigned_truck_rows.all(db.session.execute(stmt))
+    volumes = get_truck_volumes({t['id'] for t in trucks})
+    for truck in trucks:
+        truck['volume'] = volumes.get(truck['id'], 0)
+    return json_response(trucks)
 
 @app.route('/reports/usage', methods=['GET'])
 @login_required(role='Manager')
 def truck_usage():
     days = int(request.args.get('days', 30))
     start_date = datetime.utcnow() - timedelta(days=days)
-    trucks = Truck.query.all()
-    usage = []
-    for truck in trucks:
-        consignments = Consignment.query.join(ConsignmentTruck).filter(
-            ConsignmentTruck.truck_id == truck.id,
-            Consignment.dispatched_at >= start_date
-        ).all()
-        usage.append({
-            'truck_id': truck.id,
-            'consignments_handled': len(consignments),
-            'total_volume': sum(c.volume for c in consignments)
-        })
-    return jsonify(usage)
+    archived = get_archive().usage_by_truck(to_timestamp(start_date))
+    def shard_usage():
+        handled = {truck_id: (count, volume) for truck_id, count, volume in db.session.execute(lambda_stmt(
+            lambda: select(ConsignmentTruck.truck_id, func.count(Consignment.id), func.sum(Consignment.volume)).join(
+                Consignment, Consignment.id == ConsignmentTruck.consignment_id
+            ).where(Consignment.dispatched_at >= start_date).group_by(ConsignmentTruck.truck_id)
+        ))}
+        usage = []
+        for (truck_id,) in db.session.execute(lambda_stmt(lambda: select(Truck.id))):
+            count, volume = handled.get(truck_id, (0, 0))
+            archived_count, archived_volume = archived.get(truck_id, (0, 0.0))
+            usage.append({
+                'truck_id': truck_id,
+                'consignments_handled': count + archived_count,
+                'total_volume': volume + archived_volume
+            })
+        return usage
+    return json_response(list(chain.from_iterable(fan_out(shard_usage))))
 
 @app.route('/reports/consignments', methods=['GET'])
 @login_required(role='Manager')
 def consignment_report():
     destination = request.args.get('destination')
-    query = Consignment.query
-    if destination:
-        query = query.filter_by(destination=destination)
-    consignments = query.all()
-    return jsonify({
-        'total_volume': sum(c.volume for c in consignments),
-        'total_revenue': sum(c.charge for c in consignments),
-        'count': len(consignments)
+    def shard_totals():
+        stmt = lambda_stmt(lambda: select(
+            func.count(Consignment.id), func.coalesce(func.sum(Consignment.volume), 0),
+            func.coalesce(func.sum(Consignment.charge), 0)
+        ))
+        if destination:
+            stmt += lambda s: s.where(Consignment.destination == destination)
+        return db.session.execute(stmt).one()
+    count, total_volume, total_revenue = get_archive().totals(destination)
+    for shard_count, shard_volume, shard_revenue in fan_out(shard_totals):
+        count += shard_count
+        total_volume += shard_volume
+        total_revenue += shard_revenue
+    return json_response({
+        'total_volume': total_volume,
+        'total_revenue': total_revenue,
+        'count': count
     })
 
 @app.route('/reports/waiting', methods=['GET'])
 @login_required(role='Manager')
 def waiting_report():
-    consignments = Consignment.query.filter(Consignment.status == 'Dispatched').all()
-    waiting_times = [
-        (c.dispatched_at - c.created_at).total_seconds() / 3600
-        for c in consignments if c.dispatched_at
-    ]
-    avg_waiting = sum(waiting_times) / len(waiting_times) if waiting_times else 0
-    trucks = Truck.query.filter_by(status='Available').all()
-    idle_times = [
-        (datetime.utcnow() - t.last_updated).total_seconds() / 3600
-        for t in trucks
-    ]
+    days = request.args.get('days')
+    def shard_times():
+        waiting_times = [
+            (dispatched_at - created_at).total_seconds() / 3600
+            for dispatched_at, created_at in db.session.execute(lambda_stmt(
+                lambda: select(Consignment.dispatched_at, Consignment.created_at).where(
+                    Consignment.status == 'Dispatched', Consignment.dispatched_at.isnot(None)
+                )
+            ))
+        ]
+        if days:
+            start = to_timestamp(datetime.utcnow() - timedelta(days=int(days)))
+            _, _, totals = truck_status_seconds(start, to_timestamp(datetime.utcnow()))
+            idle_times = [seconds.get(status_code('Available'), 0) / 3600 for seconds in totals.values()]
+        else:
+            now = datetime.utcnow()
+            idle_times = [
+                (now - last_updated).total_seconds() / 3600
+                for (last_updated,) in db.session.execute(lambda_stmt(
+                    lambda: select(Truck.last_updated).where(Truck.status == 'Available')
+                ))
+            ]
+        return waiting_times, idle_times
+    results = fan_out(shard_times)
+    waiting_times = list(chain.from_iterable(w for w, _ in results))
+    idle_times = list(chain.from_iterable(i for _, i in results))
+    archived_count, archived_hours = get_archive().waiting_hours()
+    waiting_count = len(waiting_times) + archived_count
+    avg_waiting = (sum(waiting_times) + archived_hours) / waiting_count if waiting_count else 0
     avg_idle = sum(idle_times) / len(idle_times) if idle_times else 0
-    return jsonify({
+    return json_response({
         'avg_waiting_time_hours': avg_waiting,
         'avg_idle_time_hours': avg_idle
     })
 
+@app.route('/reports/utilization', methods=['GET'])
+@login_required(role='Manager')
+def utilization_report():
+    try:
+        start, end = parse_time_range(request.args)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid time range'}), 400
+    branch_id = request.args.get('branch_id')
+    if branch_id and not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    totals = {}
+    for start, end, shard_totals in fan_out(lambda: truck_status_seconds(start, end, branch_id),
+                                            [branch_id] if branch_id else None):
+        totals.update(shard_totals)
+    report = []
+    for truck_id, seconds in totals.items():
+        tracked = sum(seconds.values())
+        in_transit = seconds.get(status_code('In-Transit'), 0)
+        report.append({
+            'truck_id': truck_id,
+            'idle_hours': seconds.get(status_code('Available'), 0) / 3600,
+            'in_transit_hours': in_transit / 3600,
+            'utilization': in_transit / tracked if tracked else 0
+        })
+    return jsonify({
+        'start': datetime.utcfromtimestamp(start).isoformat(),
+        'end': datetime.utcfromtimestamp(end).isoformat(),
+        'trucks': report
+    })
+
+@app.route('/reports/cube', methods=['GET'])
+@login_required(role='Manager')
+def cube_report():
+    group_by = [d for d in request.args.get('group_by', '').split(',') if d]
+    metrics = [m for m in request.args.get('metrics', ','.join(METRICS)).split(',') if m]
+    if any(d not in DIMENSIONS for d in group_by) or len(set(group_by)) != len(group_by):
+        return jsonify({'error': f'group_by must be distinct values from: {", ".join(DIMENSIONS)}'}), 400
+    if not metrics or any(m not in METRICS for m in metrics):
+        return jsonify({'error': f'metrics must be values from: {", ".join(METRICS)}'}), 400
+    epoch = datetime(1970, 1, 1)
+    try:
+        start_day = (datetime.fromisoformat(request.args['start']) - epoch).days if request.args.get('start') else None
+        end_day = (datetime.fromisoformat(request.args['end']) - epoch).days if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid time range'}), 400
+    filters = {}
+    for arg, dimension in (('branch_id', 'branch'), ('destination', 'destination'), ('status', 'status')):
+        if request.args.get(arg):
+            filters[dimension] = request.args[arg]
+    refresh_cube()
+    rows = cube.query(group_by, metrics, start_day, end_day, filters)
+    return jsonify({'group_by': group_by, 'metrics': metrics, 'rows': rows})
+
+@app.route('/admission/stats', methods=['GET'])
+@login_required(role='Manager')
+def admission_stats():
+    return jsonify({
+        'rate': admission.rate,
+        'burst': admission.burst,
+        'max_in_flight': admission.max_in_flight,
+        'branches': admission.stats()
+    })
+
+CANDIDATE_LIMIT = 50
+MAX_CANDIDATE_LIMIT = 200
+
+def candidate_args():
+    """Branch, result limit and search prefix for the /candidates/* endpoints."""
+    user = db.session.get(User, session['user_id'])
+    branch_id = user.branch_id if user.role == 'Employee' else request.args.get('branch_id')
+    limit = max(1, min(request.args.get('limit', CANDIDATE_LIMIT, type=int), MAX_CANDIDATE_LIMIT))
+    return branch_id, limit, request.args.get('q', '').strip()
+
+@app.route('/candidates/trucks', methods=['GET'])
+@login_required()
+def truck_candidates():
+    branch_id, limit, q = candidate_args()
+    if not branch_id:
+        return jsonify({'error': 'Branch ID required'}), 400
+    if not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    min_free = request.args.get('min_free', 0, type=float)
+    bind_shard(branch_id)
+    loaded = db.session.query(
+        ConsignmentTruck.truck_id, func.sum(Consignment.volume).label('volume')
+    ).join(Consignment, Consignment.id == ConsignmentTruck.consignment_id).filter(
+        Consignment.branch_id == branch_id
+    ).group_by(ConsignmentTruck.truck_id).subquery()
+    free = Truck.capacity - func.coalesce(loaded.c.volume, 0)
+    query = db.session.query(Truck.id, Truck.location, free.label('free')).outerjoin(
+        loaded, loaded.c.truck_id == Truck.id
+    ).filter(Truck.branch_id == branch_id, free > 0, free >= min_free)
+    if q:
+        query = query.filter(or_(Truck.id.startswith(q, autoescape=True), Truck.location.startswith(q, autoescape=True)))
+    trucks = query.order_by(free.desc(), Truck.id).limit(limit).all()
+    return jsonify([{
+        'id': t.id,
+        'label': f'ID: {t.id}, Location: {t.location}, Free: {t.free:g}'
+    } for t in trucks])
+
+@app.route('/candidates/consignments', methods=['GET'])
+@login_required()
+def consignment_candidates():
+    branch_id, limit, q = candidate_args()
+    if not branch_id:
+        return jsonify({'error': 'Branch ID required'}), 400
+    if not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    bind_shard(branch_id)
+    query = db.session.query(Consignment.id, Consignment.volume, Consignment.destination).filter(
+        Consignment.branch_id == branch_id,
+        Consignment.status == request.args.get('status', 'Pending')
+    )
+    if q:
+        query = query.filter(or_(
+            Consignment.id.startswith(q, autoescape=True),
+            Consignment.destination.startswith(q, autoescape=True),
+            Consignment.sender_name.startswith(q, autoescape=True),
+            Consignment.receiver_name.startswith(q, autoescape=True)
+        ))
+    consignments = query.order_by(Consignment.created_at).limit(limit).all()
+    return jsonify([{
+        'id': c.id,
+        'label': f'ID: {c.id}, Volume: {c.volume:g}, Destination: {c.destination}'
+    } for c in consignments])
+
+@app.route('/candidates/employees', methods=['GET'])
+@login_required()
+def employee_candidates():
+    branch_id, limit, q = candidate_args()
+    if not branch_id:
+        return jsonify({'error': 'Branch ID required'}), 400
+    if not db.session.get(Branch, branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    query = db.session.query(User.id, User.username).filter(User.branch_id == branch_id, User.role == 'Employee')
+    if q:
+        query = query.filter(User.username.startswith(q, autoescape=True))
+    employees = query.order_by(User.username).limit(limit).all()
+    return jsonify([{'id': e.id, 'label': f'Username: {e.username}'} for e in employees])
+
 @app.route('/employees', methods=['POST'])
 @login_required(role='Manager')
+@admission_controlled
 def add_employee():
     data = request.json
     if not data.get('username') or not data.get('password') or not data.get('branch_id'):
@@ -383,23 +1399,21 @@ def add_employee():
     db.session.commit()
     return jsonify({'message': 'Employee added successfully'}), 201
 
+employee_rows = RowMapper('id', 'username', 'role', 'branch_id')
+
 @app.route('/employees', methods=['GET'])
 @login_required()
 def get_employees():
     user = db.session.get(User, session['user_id'])
-    query = User.query
+    stmt = lambda_stmt(lambda: select(User.id, User.username, User.role, User.branch_id))
     if user.role == 'Employee':
-        query = query.filter_by(branch_id=user.branch_id)
-    employees = query.all()
-    return jsonify([{
-        'id': e.id,
-        'username': e.username,
-        'role': e.role,
-        'branch_id': e.branch_id
-    } for e in employees])
+        branch_id = user.branch_id
+        stmt += lambda s: s.where(User.branch_id == branch_id)
+    return json_response(employee_rows.all(db.session.execute(stmt)))
 
 @app.route('/branches', methods=['POST'])
 @login_required(role='Manager')
+@admission_controlled
 def add_branch():
     data = request.json
     if not data.get('location'):
@@ -411,19 +1425,44 @@ def add_branch():
     db.session.commit()
     return jsonify({'message': 'Branch added successfully', 'branch_id': branch.id}), 201
 
+@app.route('/branches/routes', methods=['POST'])
+@login_required(role='Manager')
+@admission_controlled
+def add_branch_route():
+    data = request.json
+    from_branch_id = data.get('from_branch_id')
+    to_branch_id = data.get('to_branch_id')
+    if not from_branch_id or not to_branch_id or data.get('distance') is None:
+        return jsonify({'error': 'from_branch_id, to_branch_id and distance required'}), 400
+    try:
+        distance = float(data['distance'])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid distance value'}), 400
+    if distance <= 0 or from_branch_id == to_branch_id:
+        return jsonify({'error': 'Distance must be positive between two different branches'}), 400
+    if not db.session.get(Branch, from_branch_id) or not db.session.get(Branch, to_branch_id):
+        return jsonify({'error': 'Invalid branch_id'}), 400
+    route = BranchRoute(from_branch_id=from_branch_id, to_branch_id=to_branch_id, distance=distance)
+    db.session.add(route)
+    db.session.commit()
+    return jsonify({'message': 'Branch route added successfully', 'route_id': route.id}), 201
+
 # Initialize Database
 with app.app_context():
     db.drop_all()  # Drop existing tables to ensure schema is updated
     db.create_all()
+    if shard_router():
+        shard_router().drop_all()
     if not Branch.query.first():
         branches = ['Capital', 'CityA', 'CityB']
         for loc in branches:
             branch = Branch(location=loc)
             db.session.add(branch)
             db.session.commit()
+            bind_shard(branch.id)
             for _ in range(2):
                 db.session.add(Truck(location=loc, branch_id=branch.id))
-        db.session.commit()
+            db.session.commit()
     if not User.query.first():
         hashed_pwd = bcrypt.hashpw('managerpass'.encode('utf-8'), bcrypt.gensalt())
         db.session.add(User(username='manager1', password=hashed_pwd.decode('utf-8'), role='Manager'))
@@ -0,0 +1,237 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+import numpy as np
+
+# Column layout of an archived consignment segment. Free-text columns are
+# stored Arrow-style as one utf-8 byte buffer plus int64 offsets, low-cardinality
+# columns as int32 codes into a dictionary kept in meta.json. Everything is a
+# plain .npy file so segments can be memory-mapped.
+NUMERIC_COLUMNS = {'volume': np.float64, 'charge': np.float64, 'created_at': np.int64, 'dispatched_at': np.int64}
+DICTIONARY_COLUMNS = ('destination', 'status', 'truck_id')
+STRING_COLUMNS = ('id', 'sender_name', 'sender_address', 'receiver_name', 'receiver_address')
+
+
+def partition_key(row):
+    month = datetime.utcfromtimestamp(row['dispatched_at']).strftime('%Y-%m')
+    return month, row['branch_id']
+
+
+def list_segments(path):
+    """Names of the published segments of the partition at ``path``, oldest first."""
+    return sorted(name for name in os.listdir(path) if not name.endswith('.tmp'))
+
+
+class Segment:
+    """One archived batch with its own dictionaries; never changed once published."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.rows = meta['rows']
+        self.dictionaries = meta['dictionaries']
+        self._columns = {}
+
+    def load(self, filename):
+        if filename not in self._columns:
+            self._columns[filename] = np.load(os.path.join(self.path, filename), mmap_mode='r')
+        return self._columns[filename]
+
+    def strings(self, name):
+        data, offsets = self.load(f'{name}.data.npy'), self.load(f'{name}.offsets.npy')
+        raw = data.tobytes()
+        return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(self.rows)]
+
+
+class Partition:
+    """One month of archived consignments for one branch: the segments published when it was opened.
+
+    Columns spanning several segments are concatenated, with dictionary codes
+    remapped onto the partition's merged dictionaries.
+    """
+
+    def __init__(self, path, month, branch_id, segment_names=None):
+        self.path = path
+        self.month = month
+        self.branch_id = branch_id
+        self.segment_names = tuple(list_segments(path) if segment_names is None else segment_names)
+        self.segments = [Segment(os.path.join(path, name)) for name in self.segment_names]
+        self.rows = sum(segment.rows for segment in self.segments)
+        self.dictionaries = {
+            name: sorted({value for segment in self.segments for value in segment.dictionaries[name]})
+            for name in DICTIONARY_COLUMNS
+        }
+        self._columns = {}
+
+    def column(self, name):
+        """Numeric values, or dictionary codes for dictionary-encoded columns."""
+        if len(self.segments) == 1:
+            return self.segments[0].load(f'{name}.npy')
+        if name not in self._columns:
+            parts = [segment.load(f'{name}.npy') for segment in self.segments]
+            if name in DICTIONARY_COLUMNS:
+                codes = {value: i for i, value in enumerate(self.dictionaries[name])}
+                # The trailing -1 maps the "no value" code -1 onto itself.
+                remaps = [np.array([codes[value] for value in segment.dictionaries[name]] + [-1], dtype=np.int32)
+                          for segment in self.segments]
+                parts = [remap[part] for remap, part in zip(remaps, parts)]
+            self._columns[name] = np.concatenate(parts) if parts else np.zeros(0, NUMERIC_COLUMNS.get(name, np.int32))
+        return self._columns[name]
+
+    def code_of(self, name, value):
+        try:
+            return self.dictionaries[name].index(value)
+        except ValueError:
+            return -1
+
+    def strings(self, name):
+        return [value for segment in self.segments for value in segment.strings(name)]
+
+    def to_rows(self):
+        columns = {name: self.column(name).tolist() for name in NUMERIC_COLUMNS}
+        for name in DICTIONARY_COLUMNS:
+            values = self.dictionaries[name]
+            columns[name] = [values[code] if code >= 0 else None for code in self.column(name)]
+        for name in STRING_COLUMNS:
+            columns[name] = self.strings(name)
+        return [dict({name: values[i] for name, values in columns.items()}, branch_id=self.branch_id)
+                for i in range(self.rows)]
+
+
+def _write_segment(path, rows):
+    os.makedirs(path)
+    dictionaries = {}
+    for name, dtype in NUMERIC_COLUMNS.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.array([row[name] for row in rows], dtype=dtype))
+    for name in DICTIONARY_COLUMNS:
+        values = sorted({row[name] for row in rows if row[name] is not None})
+        codes = {value: i for i, value in enumerate(values)}
+        np.save(os.path.join(path, f'{name}.npy'),
+                np.array([codes.get(row[name], -1) for row in rows], dtype=np.int32))
+        dictionaries[name] = values
+    for name in STRING_COLUMNS:
+        encoded = [row[name].encode('utf-8') for row in rows]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        np.save(os.path.join(path, f'{name}.data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        np.save(os.path.join(path, f'{name}.offsets.npy'), offsets)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'rows': len(rows), 'dictionaries': dictionaries}, f)
+
+
+class ArchiveStore:
+    """Consignment archive partitioned as ``<root>/<YYYY-MM>/<branch_id>/<segment>/``."""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self._ids = {}
+
+    def append(self, rows):
+        """Add archived rows (dicts with epoch-second timestamps); returns ids now archived.
+
+        Rows go into one new segment per partition, written under a temporary
+        name and published by rename, so readers only ever see whole segments
+        and existing ones are never rewritten. Ids already in the partition are
+        skipped, so re-running after a crash is safe.
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(partition_key(row), []).append(row)
+        archived = []
+        with self._lock:
+            for (month, branch_id), new_rows in groups.items():
+                path = os.path.join(self.root, month, branch_id)
+                os.makedirs(path, exist_ok=True)
+                names = list_segments(path)
+                # Ids are read once per segment, so a long job does not re-read what it wrote.
+                known, seen = self._ids.get(path, ((), set()))
+                for name in names[len(known):] if tuple(names[:len(known)]) == known else names:
+                    seen.update(Segment(os.path.join(path, name)).strings('id'))
+                fresh = {}
+                for row in new_rows:
+                    if row['id'] not in seen:
+                        fresh.setdefault(row['id'], row)
+                if fresh:
+                    name = f'{int(names[-1]) + 1 if names else 0:06d}'
+                    tmp_path = os.path.join(path, f'{name}.tmp')
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    _write_segment(tmp_path, list(fresh.values()))
+                    os.rename(tmp_path, os.path.join(path, name))
+                    seen.update(fresh)
+                    names.append(name)
+                self._ids[path] = (tuple(names), seen)
+                archived.extend(row['id'] for row in new_rows)
+        return archived
+
+    def partitions(self, since=None, branch_id=None):
+        """Partitions that can hold rows dispatched at or after ``since`` (epoch seconds)."""
+        if not os.path.isdir(self.root):
+            return []
+        first_month = datetime.utcfromtimestamp(since).strftime('%Y-%m') if since is not None else None
+        result = []
+        for month in sorted(os.listdir(self.root)):
+            if first_month and month < first_month:
+                continue
+            month_path = os.path.join(self.root, month)
+            if not os.path.isdir(month_path):
+                continue
+            for branch in sorted(os.listdir(month_path)):
+                if branch_id and branch != branch_id:
+                    continue
+                path = os.path.join(month_path, branch)
+                names = tuple(list_segments(path))
+                if not names:
+                    continue
+                with self._lock:
+                    cached = self._partitions.get(path)
+                    if cached is None or cached.segment_names != names:
+                        cached = Partition(path, month, branch, names)
+                        self._partitions[path] = cached
+                result.append(cached)
+        return result
+
+    def totals(self, destination=None):
+        """``(count, volume, revenue)`` over the archive, optionally for one destination."""
+        count, volume, revenue = 0, 0.0, 0.0
+        for partition in self.partitions():
+            if destination is None:
+                mask = slice(None)
+            else:
+                mask = partition.column('destination') == partition.code_of('destination', destination)
+            volumes = partition.column('volume')[mask]
+            count += len(volumes)
+            volume += float(volumes.sum())
+            revenue += float(partition.column('charge')[mask].sum())
+        return count, volume, revenue
+
+    def usage_by_truck(self, since):
+        """``{truck_id: (consignments, volume)}`` for rows dispatched at or after ``since``."""
+        usage = {}
+        for partition in self.partitions(since=since):
+            mask = partition.column('dispatched_at') >= since
+            codes = partition.column('truck_id')[mask]
+            mask_codes = codes >= 0
+            codes = codes[mask_codes]
+            volumes = partition.column('volume')[mask][mask_codes]
+            trucks = partition.dictionaries['truck_id']
+            counts = np.bincount(codes, minlength=len(trucks))
+            sums = np.bincount(codes, weights=volumes, minlength=len(trucks))
+            for code, truck_id in enumerate(trucks):
+                if counts[code]:
+                    handled, volume = usage.get(truck_id, (0, 0.0))
+                    usage[truck_id] = (handled + int(counts[code]), volume + float(sums[code]))
+        return usage
+
+    def waiting_hours(self):
+        """``(count, total_hours)`` between creation and dispatch over the archive."""
+        count, total = 0, 0.0
+        for partition in self.partitions():
+            waits = partition.column('dispatched_at') - partition.column('created_at')
+            count += len(waits)
+            total += float(waits.sum()) / 3600
+        return count, total
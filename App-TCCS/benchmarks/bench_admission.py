@@ -0,0 +1,81 @@
+# Benchmark: latency of other branches' POST /consignments while one branch floods it
+# at a fixed offered rate, with admission control off and on.
+# Run from App-TCCS: python benchmarks/bench_admission.py [flood_rate] [seconds] [flood_threads]
+# Importing app initialises instance/tccs.db the same way starting the server does.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as app_module
+from admission import AdmissionController
+from app import app, Branch
+
+def logged_in_client():
+    client = app.test_client()
+    client.post('/login', data={'username': 'manager1', 'password': 'managerpass'})
+    return client
+
+def consignment(branch_id):
+    return {'volume': 1, 'destination': 'CityB', 'sender_name': 'S', 'sender_address': 'SA',
+            'receiver_name': 'R', 'receiver_address': 'RA', 'branch_id': branch_id}
+
+def run(flood_branch, other_branches, flood_rate, seconds, flood_threads):
+    stop = threading.Event()
+    flood_statuses = Counter()
+    latencies = []
+    other_statuses = Counter()
+
+    def flood(client):
+        # Open loop: each thread sends on a fixed schedule and ignores Retry-After.
+        interval = flood_threads / flood_rate
+        next_send = time.perf_counter()
+        while not stop.is_set():
+            flood_statuses[client.post('/consignments', json=consignment(flood_branch)).status_code] += 1
+            next_send += interval
+            time.sleep(max(0, next_send - time.perf_counter()))
+
+    def steady(client, branch_id):
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.post('/consignments', json=consignment(branch_id)).status_code
+            latencies.append(time.perf_counter() - start)
+            other_statuses[status] += 1
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=flood, args=(logged_in_client(),)) for _ in range(flood_threads)]
+    threads += [threading.Thread(target=steady, args=(logged_in_client(), branch_id)) for branch_id in other_branches]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  flooded branch statuses: {dict(flood_statuses)}")
+    print(f"  other branches: {len(latencies)} requests, p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+          f"statuses {dict(other_statuses)}")
+
+def main():
+    flood_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    flood_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    with app.app_context():
+        branch_ids = [b.id for b in Branch.query.order_by(Branch.location).all()]
+    flood_branch, other_branches = branch_ids[0], branch_ids[1:]
+    for enabled in (False, True):
+        app.config['ADMISSION_ENABLED'] = enabled
+        app_module.admission = AdmissionController(
+            app.config['ADMISSION_RATE'], app.config['ADMISSION_BURST'], app.config['ADMISSION_MAX_IN_FLIGHT']
+        )
+        print(f"admission {'on' if enabled else 'off'}, one branch offering {flood_rate:g} req/s "
+              f"from {flood_threads} threads for {seconds:g}s:")
+        run(flood_branch, other_branches, flood_rate, seconds, flood_threads)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Benchmark: analytics cube refresh and group-by latency over millions of rows.
+# Run from App-TCCS: python benchmarks/bench_cube.py [rows]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analytics import ConsignmentCube
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(42)
+    branches = np.array([f'branch-{i}' for i in range(50)], dtype=object)
+    destinations = np.array([f'City{i}' for i in range(200)], dtype=object)
+    statuses = np.array(['Pending', 'Dispatched'], dtype=object)
+    cube = ConsignmentCube()
+
+    start = time.perf_counter()
+    for offset in range(0, n, 100_000):
+        size = min(100_000, n - offset)
+        cube.add(
+            [f'c{i}' for i in range(offset, offset + size)],
+            branches[rng.integers(0, len(branches), size)],
+            destinations[rng.integers(0, len(destinations), size)],
+            statuses[rng.integers(0, 2, size)],
+            rng.integers(19000, 19730, size),
+            rng.uniform(1, 50, size),
+            rng.uniform(10, 750, size),
+        )
+    print(f"rows={n} load: {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    cube.add(['c0', f'c{n}'], ['branch-0', 'branch-1'], ['City0', 'City1'], ['Dispatched'] * 2, [19730] * 2, [1, 2], [10, 20])
+    print(f"incremental refresh (2 rows): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    for group_by, filters in [
+        (['branch'], None),
+        (['destination', 'status'], None),
+        (['branch', 'destination', 'month'], None),
+        (['branch', 'day'], None),
+        (['destination', 'week'], {'status': 'Pending'}),
+    ]:
+        start = time.perf_counter()
+        rows = cube.query(group_by, ['volume', 'revenue', 'count'], filters=filters)
+        print(f"group_by={','.join(group_by)} filters={filters}: {len(rows)} groups "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
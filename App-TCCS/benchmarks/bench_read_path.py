@@ -0,0 +1,77 @@
+# Benchmark: CPU time and allocations of a 100k-row /consignments response,
+# ORM instances + jsonify versus cached lambda statements + RowMapper + json_response.
+# Run from App-TCCS: python benchmarks/bench_read_path.py [rows] [repeats]
+# Importing app initialises instance/tccs.db the same way starting the server does.
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, insert, lambda_stmt, select
+from sqlalchemy.orm import Session
+from app import app, db, Consignment, consignment_rows
+from readpath import json_response, orjson
+
+def orm_response(session, branch_id):
+    consignments = session.query(Consignment).filter_by(branch_id=branch_id).all()
+    return app.json.response([{
+        'id': c.id,
+        'volume': c.volume,
+        'destination': c.destination,
+        'status': c.status,
+        'charge': c.charge,
+        'created_at': c.created_at.isoformat(),
+        'branch_id': c.branch_id
+    } for c in consignments])
+
+def core_response(session, branch_id):
+    stmt = lambda_stmt(lambda: select(
+        Consignment.id, Consignment.volume, Consignment.destination, Consignment.status,
+        Consignment.charge, Consignment.created_at, Consignment.branch_id
+    ))
+    stmt += lambda s: s.where(Consignment.branch_id == branch_id)
+    return json_response(consignment_rows.all(session.execute(stmt)))
+
+def measure(name, fn, engine, repeats):
+    with app.app_context():
+        with Session(engine) as session:
+            size = len(fn(session, 'branch-0').get_data())  # warm statement caches
+        cpu = []
+        for _ in range(repeats):
+            with Session(engine) as session:
+                start = time.process_time()
+                fn(session, 'branch-0')
+                cpu.append(time.process_time() - start)
+        with Session(engine) as session:
+            tracemalloc.start()
+            fn(session, 'branch-0')
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    print(f"{name}: {size / 1e6:.1f} MB body, cpu {min(cpu) * 1000:.0f} ms/request (best of {repeats}), "
+          f"peak allocated {peak / 1e6:.1f} MB")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine, tables=[Consignment.__table__])
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Consignment), [{
+            'id': f'cons-{i}', 'volume': 1 + i % 50, 'destination': f'City{i % 20}',
+            'sender_name': 'S', 'sender_address': 'SA', 'receiver_name': 'R', 'receiver_address': 'RA',
+            'status': 'Pending', 'charge': 15.0 * (1 + i % 50), 'created_at': now - timedelta(minutes=i),
+            'branch_id': 'branch-0'
+        } for i in range(n)])
+    print(f"rows={n} encoder={'orjson' if orjson else 'json'}")
+    measure('orm + jsonify', orm_response, engine, repeats)
+    measure('lambda_stmt + json_response', core_response, engine, repeats)
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
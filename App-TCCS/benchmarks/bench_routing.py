@@ -0,0 +1,51 @@
+# Benchmark: all-pairs distance matrix and multi-stop planning at 1k branches.
+# Run from App-TCCS: python benchmarks/bench_routing.py [branches]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routing import DistanceMatrixCache, plan_route
+
+def make_graph(n, degree=4, seed=42):
+    rng = random.Random(seed)
+    branch_ids = [f'branch-{i}' for i in range(n)]
+    points = [(rng.uniform(0, 2000), rng.uniform(0, 2000)) for _ in range(n)]
+    edges = []
+    for i in range(n):
+        # A spanning chain keeps the graph connected; extra edges go to random branches.
+        targets = [i + 1] if i + 1 < n else []
+        targets += rng.sample(range(n), degree - 1)
+        for j in targets:
+            if i != j:
+                (x1, y1), (x2, y2) = points[i], points[j]
+                edges.append((branch_ids[i], branch_ids[j], ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5))
+    return branch_ids, edges
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    branch_ids, edges = make_graph(n)
+    cache = DistanceMatrixCache(lambda: (branch_ids, edges))
+
+    start = time.perf_counter()
+    matrix = cache.get()
+    build = time.perf_counter() - start
+    print(f"branches={n} edges={len(edges)} matrix build: {build * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.get()
+    print(f"cached lookup: {(time.perf_counter() - start) * 1e6 / 1000:.2f} us")
+
+    rng = random.Random(7)
+    for stops in (5, 20, 50):
+        plans = 20
+        start = time.perf_counter()
+        for _ in range(plans):
+            plan_route(matrix, rng.choice(branch_ids), rng.sample(branch_ids, stops))
+        print(f"plan {stops}-stop route: {(time.perf_counter() - start) * 1000 / plans:.2f} ms")
+
+if __name__ == '__main__':
+    main()
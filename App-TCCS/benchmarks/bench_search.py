@@ -0,0 +1,75 @@
+# Benchmark: consignment full-text search latency over millions of rows.
+# Run from App-TCCS: python benchmarks/bench_search.py [rows]
+# Importing app initialises instance/tccs.db the same way starting the server does.
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, insert, select
+from app import db, Consignment, consignment_search_stmt
+from search import match_expression
+
+SYLLABLES = ['al', 'an', 'bar', 'ber', 'cor', 'da', 'dun', 'el', 'en', 'fa', 'gal', 'ha', 'in', 'ja', 'ka',
+             'ko', 'la', 'li', 'ma', 'mi', 'na', 'no', 'or', 'pa', 'ri', 'ro', 'sa', 'se', 'ta', 'to', 'vi', 'yu']
+
+def words(rng, count, syllables):
+    """``count`` distinct capitalised made-up words, so the vocabulary looks like real customer names."""
+    result = set()
+    while len(result) < count:
+        result.add(''.join(rng.choice(SYLLABLES, syllables)).capitalize())
+    return sorted(result)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(7)
+    first_names, last_names, streets = words(rng, 3_000, 3), words(rng, 20_000, 4), words(rng, 2_000, 3)
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine, tables=[Consignment.__table__])
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, n, 50_000):
+            size = min(50_000, n - offset)
+            first = rng.integers(0, len(first_names), (2, size))
+            last = rng.integers(0, len(last_names), (2, size))
+            number = rng.integers(1, 500, (2, size))
+            street = rng.integers(0, len(streets), (2, size))
+            conn.execute(insert(Consignment), [{
+                'id': f'cons-{offset + i}', 'volume': 1.0, 'charge': 15.0, 'status': 'Pending',
+                'destination': f'City{(offset + i) % 50}', 'branch_id': f'branch-{(offset + i) % 20}',
+                'sender_name': f'{first_names[first[0, i]]} {last_names[last[0, i]]}',
+                'sender_address': f'{number[0, i]} {streets[street[0, i]]} Street',
+                'receiver_name': f'{first_names[first[1, i]]} {last_names[last[1, i]]}',
+                'receiver_address': f'{number[1, i]} {streets[street[1, i]]} Road',
+            } for i in range(size)])
+    print(f"rows={n} load + index: {time.perf_counter() - start:.1f} s")
+
+    with engine.connect() as conn:
+        sample = conn.execute(select(Consignment.sender_name, Consignment.receiver_address, Consignment.branch_id)
+                              .where(Consignment.id == 'cons-12345')).one()
+        first, last = sample.sender_name.split()
+        street = sample.receiver_address.split()[1]
+        for q, branch_id in [
+            (sample.sender_name, None),                     # full name
+            (f'{first.lower()} {last[:4]}', sample.branch_id),  # name prefixes, employee scope
+            (last, None),                                   # surname only
+            (f'{street} {first[:3]}', None),                # street plus first-name prefix
+            (first[:3], None),                              # bare three-letter prefix, the broadest search
+        ]:
+            stmt = consignment_search_stmt(match_expression(q), branch_id, 21)
+            conn.execute(stmt).all()
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                rows = conn.execute(stmt).all()
+                timings.append(time.perf_counter() - start)
+            print(f"q={q!r} branch={branch_id}: {len(rows)} rows, best {min(timings) * 1000:.1f} ms")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# Benchmark: dispatch-policy parameter sweep throughput on a process pool.
+# Run from App-TCCS: python benchmarks/bench_simulator.py [days] [branches] [workers]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulator import ThresholdPolicy, default_scenarios, simulate, sweep, synthetic_arrivals
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    branches = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    arrivals = synthetic_arrivals(seed=1, branches=branches, days=days)
+    print(f"arrivals={len(arrivals)} ({branches} branches, {days} days), workers={workers}")
+
+    start = time.perf_counter()
+    simulate(arrivals, ThresholdPolicy())
+    single = time.perf_counter() - start
+    print(f"one scenario: {single * 1000:.0f} ms")
+
+    scenarios = default_scenarios(trucks_per_branch=range(1, 7), trip_hours=(6, 12, 24, 48))
+    start = time.perf_counter()
+    results = sweep(arrivals, scenarios, workers)
+    elapsed = time.perf_counter() - start
+    print(f"sweep: {len(results)} scenarios in {elapsed:.1f} s "
+          f"({len(results) / elapsed:.1f} scenarios/s, {elapsed / len(results) * 1000:.0f} ms each)")
+    best = min(results, key=lambda r: (r['pending_at_end'], r['avg_waiting_time_hours']))
+    print(f"best: {best}")
+
+if __name__ == '__main__':
+    main()
@@ -219,4 +219,14 @@ def ensure_truck_citya1_exists(db_session):
              db_session.rollback() # Rollback if status update fails
              print(f"Warning: Failed to commit truck status update for {truck_id}: {e}")
         print(f"--- Fixture ensure_truck_citya1_exists: Truck {truck_id} exists ---")
-    return truck
\ No newline at end of file
+    return truck
+
+# --- make_consignment ---
+@pytest.fixture
+def make_consignment():
+    """Returns a factory for unsaved consignments; tests pass only the fields they care about."""
+    def make(cons_id, volume=10, **fields):
+        defaults = {'destination': 'CityB', 'sender_name': 'S', 'sender_address': 'SA', 'receiver_name': 'R',
+                    'receiver_address': 'RA', 'charge': volume * 15, 'branch_id': 'branch-citya', 'status': 'Pending'}
+        return Consignment(id=cons_id, volume=volume, **{**defaults, **fields})
+    return make
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from html import escape
+
+FORMATS = {'text': 'text/plain; charset=utf-8', 'html': 'text/html; charset=utf-8'}
+LINE_WIDTH = 78
+
+_HTML_HEAD = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; font-size: 12px; }}
+section {{ page-break-after: always; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border: 1px solid #444; padding: 4px; text-align: left; vertical-align: top; }}
+</style>
+</head>
+<body>
+'''
+HTML_TAIL = b'</body>\n</html>\n'
+
+
+def html_head(title):
+    return _HTML_HEAD.format(title=escape(title)).encode('utf-8')
+
+
+def _text(truck, branch, consignments):
+    rule = '-' * LINE_WIDTH
+    lines = [
+        'DISPATCH MANIFEST',
+        f"Truck: {truck['id']}",
+        f"Branch: {branch}    Location: {truck['location']}    Status: {truck['status']}",
+        f"Manifest version: {truck['dispatch_version']}",
+        rule,
+    ]
+    for number, c in enumerate(consignments, 1):
+        dispatched = c['dispatched_at'].strftime('%Y-%m-%d %H:%M') if c['dispatched_at'] else '-'
+        lines += [
+            f"{number:>3}. {c['id']}",
+            f"     Destination: {c['destination']}    Volume: {c['volume']:.2f} m3    "
+            f"Charge: {c['charge']:.2f}    Dispatched: {dispatched}",
+            f"     From: {c['sender_name']}, {c['sender_address']}",
+            f"     To:   {c['receiver_name']}, {c['receiver_address']}",
+        ]
+    total_volume = sum(c['volume'] for c in consignments)
+    lines += [
+        rule,
+        f"Consignments: {len(consignments)}    Total volume: {total_volume:.2f} / {truck['capacity']:.2f} m3    "
+        f"Total charge: {sum(c['charge'] for c in consignments):.2f}",
+        '',
+        'Driver signature: ______________________    Branch stamp: ______________________',
+        '\f',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _html(truck, branch, consignments):
+    rows = ''.join(
+        '<tr><td>{}</td><td>{}</td><td>{}<br>{}</td><td>{}<br>{}</td><td>{}</td><td>{:.2f}</td><td>{:.2f}</td>'
+        '<td>{}</td></tr>\n'.format(
+            number, escape(c['id']), escape(c['sender_name']), escape(c['sender_address']),
+            escape(c['receiver_name']), escape(c['receiver_address']), escape(c['destination']),
+            c['volume'], c['charge'], c['dispatched_at'].strftime('%Y-%m-%d %H:%M') if c['dispatched_at'] else '-'
+        )
+        for number, c in enumerate(consignments, 1)
+    )
+    return (
+        f"<section>\n<h2>Dispatch manifest: truck {escape(truck['id'])}</h2>\n"
+        f"<p>Branch: {escape(branch)} &middot; Location: {escape(truck['location'])} &middot; "
+        f"Status: {escape(truck['status'])} &middot; Manifest version: {truck['dispatch_version']}</p>\n"
+        '<table>\n<tr><th>#</th><th>Consignment</th><th>Sender</th><th>Receiver</th><th>Destination</th>'
+        '<th>Volume (m3)</th><th>Charge</th><th>Dispatched</th></tr>\n'
+        f"{rows}</table>\n"
+        f"<p>Consignments: {len(consignments)} &middot; "
+        f"Total volume: {sum(c['volume'] for c in consignments):.2f} / {truck['capacity']:.2f} m3 &middot; "
+        f"Total charge: {sum(c['charge'] for c in consignments):.2f}</p>\n"
+        '<p>Driver signature: ____________________ &middot; Branch stamp: ____________________</p>\n'
+        '</section>\n'
+    )
+
+
+def render(format, truck, branch, consignments):
+    """One truck's manifest; text manifests end in a form feed so batches print one per page."""
+    return (_html if format == 'html' else _text)(truck, branch, consignments).encode('utf-8')
+
+
+class ManifestCache:
+    """Rendered manifests keyed by ``(truck_id, dispatch_version, format)``, least recently used evicted.
+
+    A new dispatch bumps the truck's version, so stale entries are never
+    served; they simply age out.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
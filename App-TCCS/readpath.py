@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder.
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Encode ``payload`` to JSON bytes; naive datetimes are written in isoformat."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+class RowMapper:
+    """Turns Core row tuples into dicts under a fixed list of keys.
+
+    The keys are fixed per route, so rows are zipped straight into dicts
+    without going through ORM instances or per-column attribute lookups.
+    """
+
+    def __init__(self, *keys):
+        self.keys = keys
+
+    def one(self, row):
+        return dict(zip(self.keys, row))
+
+    def all(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,138 @@
+import threading
+import numpy as np
+
+
+class DistanceMatrix:
+    """All-pairs shortest paths between branches, indexed by branch id."""
+
+    def __init__(self, branch_ids, dist, neighbours):
+        self.branch_ids = list(branch_ids)
+        self.index = {branch_id: i for i, branch_id in enumerate(self.branch_ids)}
+        self.dist = dist
+        self.neighbours = neighbours
+
+    def distance(self, from_id, to_id):
+        i, j = self.index.get(from_id), self.index.get(to_id)
+        if i is None or j is None:
+            return float('inf')
+        return float(self.dist[i, j])
+
+    def path(self, from_id, to_id):
+        i, j = self.index.get(from_id), self.index.get(to_id)
+        if i is None or j is None or not np.isfinite(self.dist[i, j]):
+            return []
+        hops = [i]
+        # Walk the neighbour that lies on a shortest path; positive edge weights
+        # guarantee progress, the bound only protects against rounding loops.
+        while i != j and len(hops) <= len(self.branch_ids):
+            i = min(self.neighbours[i], key=lambda edge: edge[1] + self.dist[edge[0], j])[0]
+            hops.append(i)
+        return [self.branch_ids[k] for k in hops]
+
+
+def shortest_path_matrix(branch_ids, edges):
+    """Vectorized Floyd-Warshall over undirected (from_id, to_id, distance) edges.
+
+    Distances are float64 so user-entered kilometres come back as entered
+    (1k branches is still only 8 MB); paths are rebuilt on demand from the
+    adjacency lists instead of tracking a next-hop matrix during the sweep.
+    """
+    branch_ids = list(branch_ids)
+    index = {branch_id: i for i, branch_id in enumerate(branch_ids)}
+    n = len(branch_ids)
+    dist = np.full((n, n), np.inf, dtype=np.float64)
+    np.fill_diagonal(dist, 0.0)
+    neighbours = [[] for _ in range(n)]
+    for from_id, to_id, distance in edges:
+        i, j = index.get(from_id), index.get(to_id)
+        if i is None or j is None or i == j:
+            continue
+        neighbours[i].append((j, distance))
+        neighbours[j].append((i, distance))
+        if distance < dist[i, j]:
+            dist[i, j] = dist[j, i] = distance
+    via = np.empty_like(dist)
+    for k in range(n):
+        # Row and column k cannot improve through k itself, so updating in place is safe.
+        np.add(dist[:, k, None], dist[None, k, :], out=via)
+        np.minimum(dist, via, out=dist)
+    return DistanceMatrix(branch_ids, dist, neighbours)
+
+
+class DistanceMatrixCache:
+    """Lazily builds the distance matrix from ``loader`` and keeps it until invalidated.
+
+    ``loader`` returns ``(branch_ids, edges)``.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._version = 0
+
+    def get(self):
+        matrix = self._matrix
+        if matrix is not None:
+            return matrix
+        with self._lock:
+            if self._matrix is None:
+                version = self._version
+                branch_ids, edges = self._loader()
+                matrix = shortest_path_matrix(branch_ids, edges)
+                # Drop the result if the graph changed while we were building it.
+                if version != self._version:
+                    return matrix
+                self._matrix = matrix
+            return self._matrix
+
+    def invalidate(self):
+        self._version += 1
+        self._matrix = None
+
+
+def _route_length(matrix, start, order):
+    total, current = 0.0, start
+    for stop in order:
+        total += matrix.dist[current, stop]
+        current = stop
+    return total
+
+
+def plan_route(matrix, start_id, stop_ids):
+    """Order ``stop_ids`` into a short open route starting at ``start_id``.
+
+    Nearest-neighbour construction followed by 2-opt improvement. Returns
+    ``(ordered_stop_ids, unreachable_stop_ids)``.
+    """
+    start = matrix.index.get(start_id)
+    stops, unreachable = [], []
+    at_start = False
+    for stop_id in dict.fromkeys(stop_ids):
+        i = matrix.index.get(stop_id)
+        if i is None or start is None or not np.isfinite(matrix.dist[start, i]):
+            unreachable.append(stop_id)
+        elif i == start:
+            at_start = True
+        else:
+            stops.append(i)
+    order = []
+    remaining = set(stops)
+    current = start
+    while remaining:
+        current = min(remaining, key=lambda i: matrix.dist[current, i])
+        order.append(current)
+        remaining.remove(current)
+    improved = True
+    while improved and len(order) > 2:
+        improved = False
+        best = _route_length(matrix, start, order)
+        for a in range(len(order) - 1):
+            for b in range(a + 1, len(order)):
+                candidate = order[:a] + order[a:b + 1][::-1] + order[b + 1:]
+                length = _route_length(matrix, start, candidate)
+                if length + 1e-9 < best:
+                    order, best, improved = candidate, length, True
+    if at_start:
+        order.insert(0, start)
+    return [matrix.branch_ids[i] for i in order], unreachable
@@ -0,0 +1,67 @@
+import re
+import sqlalchemy as sa
+
+FTS_TABLE = 'consignment_fts'
+FTS_COLUMNS = ('sender_name', 'sender_address', 'receiver_name', 'receiver_address', 'destination')
+MAX_TERMS = 8
+MIN_PREFIX_LENGTH = 3  # Shorter terms only match whole words; their prefixes would match most rows
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# External-content FTS5 index over the consignment table, addressed by its
+# ``seq`` column. seq is a stable integer id drawn from a one-row counter table
+# by the insert trigger. Unlike the implicit rowid of a table with a TEXT
+# primary key, VACUUM cannot renumber it, and unlike max(seq) + 1 it is never
+# reused after deletes. Prefix indexes on 3 and 4 characters keep short prefix
+# queries off a full vocabulary scan. Triggers keep the index in step with
+# every insert, delete and update of an indexed column, including bulk Core
+# statements.
+SEQ_COLUMN = 'seq'
+SEQ_TABLE = 'consignment_seq'
+_columns = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_old = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+CREATE_STATEMENTS = (
+    f"CREATE TABLE IF NOT EXISTS {SEQ_TABLE} (value INTEGER NOT NULL)",
+    f"INSERT INTO {SEQ_TABLE}(value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {SEQ_TABLE})",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_columns}, content='consignment', "
+    f"content_rowid='{SEQ_COLUMN}', tokenize='unicode61 remove_diacritics 2', prefix='3 4')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON consignment BEGIN "
+    f"UPDATE {SEQ_TABLE} SET value = value + 1; "
+    f"UPDATE consignment SET {SEQ_COLUMN} = (SELECT value FROM {SEQ_TABLE}) "
+    f"WHERE rowid = new.rowid AND {SEQ_COLUMN} IS NULL; "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) "
+    f"SELECT {SEQ_COLUMN}, {_columns} FROM consignment WHERE rowid = new.rowid; END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON consignment BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.{SEQ_COLUMN}, {_old}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON consignment BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.{SEQ_COLUMN}, {_old}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.{SEQ_COLUMN}, {_new}); END",
+)
+
+fts = sa.table(FTS_TABLE, sa.column('rowid'), sa.column('rank'), sa.column(FTS_TABLE))
+
+
+def install(table):
+    """Create the index, its triggers and the seq counter with ``table`` and drop them with it, on every engine."""
+    for statement in CREATE_STATEMENTS:
+        sa.event.listen(table, 'after_create', sa.DDL(statement))
+    for name in (FTS_TABLE, SEQ_TABLE):
+        sa.event.listen(table, 'before_drop', sa.DDL(f'DROP TABLE IF EXISTS {name}'))
+
+
+def match_expression(q):
+    """FTS5 query matching rows that contain every term of ``q`` as a word prefix, or None.
+
+    Terms are reduced to word characters and quoted, so user input can never
+    use FTS5 query syntax. Terms shorter than ``MIN_PREFIX_LENGTH`` must match
+    a whole word.
+    """
+    terms = _TERM.findall(q)[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' if len(term) >= MIN_PREFIX_LENGTH else f'"{term}"' for term in terms)
+
+
+def rebuild(connection):
+    """Repopulate the index from the content table, e.g. after restoring a database file."""
+    connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,114 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import sqlalchemy as sa
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def bind_shard(branch_id):
+    """Route shard-scoped tables to ``branch_id``'s database for the rest of this context."""
+    _current_shard.set(branch_id)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+class ShardRouter:
+    """One SQLite database per branch holding the tables named in ``tables``.
+
+    ``branch_exists(branch_id)``, when given, is asked before a shard is first
+    opened so that unknown ids never create a database file.
+    """
+
+    def __init__(self, directory, metadata, tables, max_workers=8, branch_exists=None):
+        self.directory = directory
+        self.metadata = metadata
+        self.tables = frozenset(tables)
+        self.max_workers = max_workers
+        self.branch_exists = branch_exists
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _path(self, branch_id):
+        return os.path.join(self.directory, f'{branch_id}.db')
+
+    def engine_for(self, branch_id):
+        engine = self._engines.get(branch_id)
+        if engine is not None:
+            return engine
+        if not _safe_name(branch_id) or (self.branch_exists and not self.branch_exists(branch_id)):
+            raise ValueError(f'No shard for branch {branch_id!r}')
+        return self._open(branch_id)
+
+    def _open(self, branch_id):
+        with self._lock:
+            if branch_id not in self._engines:
+                os.makedirs(self.directory, exist_ok=True)
+                engine = sa.create_engine(f'sqlite:///{self._path(branch_id)}')
+                sa.event.listen(engine, 'connect', _enable_wal)
+                self.metadata.create_all(engine, tables=[self.metadata.tables[name] for name in self.tables])
+                self._engines[branch_id] = engine
+            return self._engines[branch_id]
+
+    def drop_all(self):
+        """Drop and recreate the shard tables in every existing shard database."""
+        if not os.path.isdir(self.directory):
+            return
+        tables = [self.metadata.tables[name] for name in self.tables]
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.db'):
+                engine = self._open(filename[:-3])
+                self.metadata.drop_all(engine, tables=tables)
+                self.metadata.create_all(engine, tables=tables)
+
+    def map(self, fn, branch_ids):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='shard')
+        return list(self._executor.map(fn, branch_ids))
+
+
+def _safe_name(branch_id):
+    """True if ``branch_id`` can only name a file directly inside the shard directory."""
+    return (isinstance(branch_id, str) and branch_id not in ('', '.', '..') and '\0' not in branch_id
+            and os.sep not in branch_id and not (os.altsep and os.altsep in branch_id))
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+
+def _statement_tables(clause):
+    if isinstance(clause, sa.Table):
+        return [clause]
+    if isinstance(clause, sa.sql.dml.UpdateBase) and isinstance(clause.table, sa.Table):
+        return [clause.table]
+    if isinstance(clause, sa.Select):
+        return [t for t in clause.get_final_froms() if isinstance(t, sa.Table)]
+    return []
+
+
+class ShardedSession(Session):
+    """Session that sends shard-scoped tables to the shard bound with ``bind_shard``.
+
+    Without a router in ``app.extensions['shard_router']`` it behaves like the
+    default Flask-SQLAlchemy session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        router = current_app.extensions.get('shard_router') if bind is None else None
+        if router is not None:
+            tables = [sa.inspect(mapper).local_table] if mapper is not None else _statement_tables(clause)
+            if any(table.name in router.tables for table in tables):
+                branch_id = current_shard()
+                if branch_id is None:
+                    raise RuntimeError(f'No shard bound for table {tables[0].name}')
+                return router.engine_for(branch_id)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
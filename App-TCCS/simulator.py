@@ -0,0 +1,280 @@
+import heapq
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from truck_history import HOUR
+
+# Times are seconds, volumes cubic metres. ``time`` is when the consignment was
+# booked, i.e. when check_truck_allocation would first see it.
+Arrival = namedtuple('Arrival', 'time branch_id destination volume')
+
+TRUCK_CAPACITY = 500.0
+_RETURN, _ARRIVAL, _WAKEUP = 0, 1, 2  # Order of simultaneous events
+
+
+def _fitting(queue, capacity):
+    """Length and volume of the longest FIFO prefix of ``queue`` that fits in ``capacity`` (at least one item)."""
+    count, volume = 0, 0.0
+    for _, item_volume in queue:
+        if count and volume + item_volume > capacity:
+            break
+        count += 1
+        volume += item_volume
+    return count, volume
+
+
+class ThresholdPolicy:
+    """``check_truck_allocation``: once a destination's pending volume reaches
+    ``threshold``, everything pending for it leaves on one truck.
+
+    Like production, an ``arrivals_only`` policy checks only when a consignment
+    is booked for the destination; otherwise it also checks when a truck returns.
+    """
+
+    name = 'threshold'
+
+    def __init__(self, threshold=500.0, arrivals_only=False):
+        self.threshold = threshold
+        self.arrivals_only = arrivals_only
+
+    def params(self):
+        return {'threshold': self.threshold, 'arrivals_only': self.arrivals_only}
+
+    def select(self, queue, queued_volume, now, capacity):
+        """Number of consignments at the front of ``queue`` to put on one truck now."""
+        return len(queue) if queued_volume >= self.threshold else 0
+
+    def deadline(self, queue):
+        """Time at which ``select`` should be asked again without a new event, or None."""
+        return None
+
+
+class TimeoutPolicy(ThresholdPolicy):
+    """Threshold dispatch that also sends a truck once the oldest consignment has waited ``max_wait`` seconds."""
+
+    name = 'timeout'
+
+    def __init__(self, threshold=500.0, max_wait=24 * HOUR):
+        super().__init__(threshold)
+        self.max_wait = max_wait
+
+    def params(self):
+        return {'threshold': self.threshold, 'max_wait_hours': self.max_wait / HOUR}
+
+    def select(self, queue, queued_volume, now, capacity):
+        if queued_volume >= self.threshold or now >= queue[0][0] + self.max_wait:
+            return len(queue)
+        return 0
+
+    def deadline(self, queue):
+        return queue[0][0] + self.max_wait
+
+
+class CapacityAwarePolicy:
+    """Loads trucks FIFO up to capacity and sends one once it is ``fill`` full
+    (or the oldest consignment has waited ``max_wait``); never overloads."""
+
+    name = 'capacity'
+    arrivals_only = False
+
+    def __init__(self, fill=0.8, max_wait=None):
+        self.fill = fill
+        self.max_wait = max_wait
+
+    def params(self):
+        return {'fill': self.fill, 'max_wait_hours': self.max_wait / HOUR if self.max_wait else None}
+
+    def select(self, queue, queued_volume, now, capacity):
+        count, volume = _fitting(queue, capacity)
+        if volume >= self.fill * capacity or (self.max_wait and now >= queue[0][0] + self.max_wait):
+            return count
+        return 0
+
+    def deadline(self, queue):
+        return queue[0][0] + self.max_wait if self.max_wait else None
+
+
+POLICIES = {policy.name: policy for policy in (ThresholdPolicy, TimeoutPolicy, CapacityAwarePolicy)}
+
+
+def simulate(arrivals, policy, trucks_per_branch=2, trip_seconds=24 * HOUR, capacity=TRUCK_CAPACITY,
+             end=None, detail=False):
+    """Replay ``arrivals`` (sorted by time) through ``policy`` and report dispatch metrics.
+
+    Each branch starts with ``trucks_per_branch`` available trucks; a dispatched
+    truck is in transit for ``trip_seconds`` and then available again. The
+    policy is consulted for a destination whenever a consignment arrives for
+    it, a truck returns to its branch (unless the policy is ``arrivals_only``),
+    or a deadline the policy asked for passes. Metrics cover the first arrival to ``end`` (default: last arrival).
+    """
+    if not arrivals:
+        return {'consignments': 0}
+    start = arrivals[0].time
+    end = max(end if end is not None else arrivals[-1].time, start)
+    branches = sorted({a.branch_id for a in arrivals})
+    available = {b: deque(f'{b}/{i}' for i in range(trucks_per_branch)) for b in branches}
+    trucks = {truck_id: {'idle_since': start, 'idle': 0.0, 'in_transit': 0.0, 'handled': 0, 'volume': 0.0}
+              for b in branches for truck_id in available[b]}
+    queues = {}  # (branch, destination) -> deque of (arrival time, volume)
+    queued_volume = {}
+    wakeups = {}
+    branch_queues = {b: [] for b in branches}
+    waits = []
+    trips = overloaded = 0
+    load_factor = 0.0
+    events = [(a.time, _ARRIVAL, i) for i, a in enumerate(arrivals)]
+    heapq.heapify(events)
+
+    def dispatch(key, now):
+        nonlocal trips, overloaded, load_factor
+        queue, free = queues[key], available[key[0]]
+        while queue and free:
+            count = policy.select(queue, queued_volume[key], now, capacity)
+            if not count:
+                break
+            truck_id = free.popleft()
+            truck = trucks[truck_id]
+            truck['idle'] += now - truck['idle_since']
+            volume = 0.0
+            for _ in range(count):
+                arrived, item_volume = queue.popleft()
+                waits.append(now - arrived)
+                volume += item_volume
+            queued_volume[key] -= volume
+            truck['handled'] += count
+            truck['volume'] += volume
+            truck['in_transit'] += min(trip_seconds, max(0, end - now))
+            trips += 1
+            overloaded += volume > capacity
+            load_factor += volume / capacity
+            heapq.heappush(events, (now + trip_seconds, _RETURN, truck_id))
+        if queue:
+            deadline = policy.deadline(queue)
+            if deadline is not None and deadline > now and wakeups.get(key) != deadline:
+                wakeups[key] = deadline
+                heapq.heappush(events, (deadline, _WAKEUP, key))
+
+    while events:
+        now, kind, payload = heapq.heappop(events)
+        if now > end and kind != _RETURN:
+            break
+        if kind == _ARRIVAL:
+            a = arrivals[payload]
+            key = (a.branch_id, a.destination)
+            if key not in queues:
+                queues[key] = deque()
+                queued_volume[key] = 0.0
+                branch_queues[a.branch_id].append(key)
+            queues[key].append((a.time, a.volume))
+            queued_volume[key] += a.volume
+            dispatch(key, now)
+        elif kind == _RETURN:
+            if now > end:
+                continue
+            branch_id = payload.split('/', 1)[0]
+            trucks[payload]['idle_since'] = now
+            available[branch_id].append(payload)
+            if policy.arrivals_only:
+                continue
+            # Oldest waiting destination first.
+            for key in sorted((k for k in branch_queues[branch_id] if queues[k]), key=lambda k: queues[k][0][0]):
+                dispatch(key, now)
+        elif wakeups.get(payload) == now:
+            del wakeups[payload]
+            if queues[payload]:
+                dispatch(payload, now)
+
+    for branch_id, free in available.items():
+        for truck_id in free:
+            trucks[truck_id]['idle'] += end - trucks[truck_id]['idle_since']
+    horizon = end - start
+    pending = sum(len(queue) for queue in queues.values())
+    waits = np.asarray(waits) / HOUR
+    idle_hours = [t['idle'] / HOUR for t in trucks.values()]
+    report = {
+        'policy': policy.name,
+        **policy.params(),
+        'trucks_per_branch': trucks_per_branch,
+        'trip_hours': trip_seconds / HOUR,
+        'consignments': len(arrivals),
+        'dispatched': len(waits),
+        'pending_at_end': pending,
+        'trips': trips,
+        'overloaded_trips': overloaded,
+        'avg_load_factor': load_factor / trips if trips else 0,
+        'avg_waiting_time_hours': float(waits.mean()) if len(waits) else 0,
+        'p95_waiting_time_hours': float(np.percentile(waits, 95)) if len(waits) else 0,
+        'avg_idle_time_hours': sum(idle_hours) / len(idle_hours),
+        'utilization': (sum(t['in_transit'] for t in trucks.values()) / (horizon * len(trucks))) if horizon else 0,
+    }
+    if detail:
+        # Same per-truck fields as the truck_usage and utilization reports.
+        report['trucks'] = [{
+            'truck_id': truck_id,
+            'consignments_handled': t['handled'],
+            'total_volume': t['volume'],
+            'idle_hours': t['idle'] / HOUR,
+            'in_transit_hours': t['in_transit'] / HOUR,
+            'utilization': t['in_transit'] / horizon if horizon else 0,
+        } for truck_id, t in trucks.items()]
+    return report
+
+
+def synthetic_arrivals(seed=0, branches=5, destinations=10, days=30, per_hour=4.0, mean_volume=20.0):
+    """Poisson bookings per branch with destinations skewed towards a few busy lanes."""
+    rng = np.random.default_rng(seed)
+    arrivals = []
+    weights = 1 / np.arange(1, destinations + 1)
+    weights /= weights.sum()
+    for b in range(branches):
+        count = rng.poisson(per_hour * 24 * days)
+        times = np.sort(rng.uniform(0, days * 24 * HOUR, count))
+        lanes = rng.choice(destinations, count, p=weights)
+        volumes = np.clip(rng.exponential(mean_volume, count), 0.5, TRUCK_CAPACITY)
+        arrivals.extend(Arrival(float(t), f'branch-{b}', f'City{d}', float(v))
+                        for t, d, v in zip(times, lanes, volumes))
+    arrivals.sort()
+    return arrivals
+
+
+_worker_arrivals = None
+
+
+def _init_worker(arrivals):
+    global _worker_arrivals
+    _worker_arrivals = arrivals
+
+
+def run_scenario(scenario):
+    """Run one sweep scenario: ``{'policy': name, 'params': {...}, 'trucks_per_branch', 'trip_hours'}``."""
+    policy = POLICIES[scenario['policy']](**scenario.get('params', {}))
+    return simulate(
+        _worker_arrivals, policy,
+        trucks_per_branch=scenario.get('trucks_per_branch', 2),
+        trip_seconds=scenario.get('trip_hours', 24) * HOUR,
+    )
+
+
+def sweep(arrivals, scenarios, workers=None):
+    """Run every scenario over ``arrivals`` on a process pool; results come back in scenario order.
+
+    The arrival stream is shipped once per worker process rather than once per
+    scenario.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(arrivals,)) as pool:
+        chunksize = max(1, len(scenarios) // (workers * 4))
+        return list(pool.map(run_scenario, scenarios, chunksize=chunksize))
+
+
+def default_scenarios(trucks_per_branch=(1, 2, 3), trip_hours=(12, 24)):
+    """Grid of policy parameters around the current 500 m3 threshold."""
+    policies = (
+        [('threshold', {'threshold': t, 'arrivals_only': a}) for t in (100, 200, 300, 400, 500) for a in (True, False)]
+        + [('timeout', {'threshold': t, 'max_wait': w * HOUR}) for t in (300, 500) for w in (6, 12, 24, 48)]
+        + [('capacity', {'fill': f, 'max_wait': w * HOUR if w else None})
+           for f in (0.5, 0.7, 0.9) for w in (None, 12, 24)]
+    )
+    return [{'policy': name, 'params': params, 'trucks_per_branch': trucks, 'trip_hours': hours}
+            for name, params in policies for trucks in trucks_per_branch for hours in trip_hours]
@@ -0,0 +1,71 @@
+# tests/test_admission.py
+
+import pytest
+import app as app_module
+from admission import AdmissionController, Rejected, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_refills_at_rate():
+    """Test the bucket allows a burst, then refills at its rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.take() == 0
+
+def test_controller_isolates_branches():
+    """Test one branch exhausting its bucket or in-flight slots does not affect another."""
+    clock = FakeClock()
+    controller = AdmissionController(rate=1, burst=2, max_in_flight=1, clock=clock)
+    controller.acquire('add_consignment', 'branch-a')
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire('add_consignment', 'branch-a')
+    assert rejected.value.retry_after == 1
+    controller.release('add_consignment', 'branch-a')
+    controller.acquire('add_consignment', 'branch-a')
+    controller.release('add_consignment', 'branch-a')
+    with pytest.raises(Rejected):
+        controller.acquire('add_consignment', 'branch-a')
+    controller.acquire('add_consignment', 'branch-b')
+    stats = controller.stats()
+    assert stats['branch-a'] == {'admitted': 2, 'shed_rate': 1, 'shed_in_flight': 1, 'in_flight': {}}
+    assert stats['branch-b']['in_flight'] == {'add_consignment': 1}
+
+def test_write_route_sheds_with_retry_after(logged_in_manager, monkeypatch):
+    """Test a flooded branch gets 429 with Retry-After and shows up in the stats."""
+    monkeypatch.setattr(app_module, 'admission', AdmissionController(rate=0.1, burst=1, max_in_flight=4))
+    body = {'location': 'Depot', 'branch_id': 'branch-citya'}
+    assert logged_in_manager.post('/trucks', json=body).status_code == 201
+    response = logged_in_manager.post('/trucks', json=body)
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+    assert logged_in_manager.post('/trucks', json=dict(body, branch_id='branch-capital')).status_code == 201
+    stats = logged_in_manager.get('/admission/stats').get_json()
+    assert stats['branches']['branch-citya']['shed_rate'] == 1
+    assert stats['branches']['branch-capital']['admitted'] == 1
+
+def test_write_route_charges_employees_to_their_own_branch(client, ensure_manager_exists, ensure_employee_exists,
+                                                          monkeypatch):
+    """Test a spoofed or made-up body branch_id cannot pick the bucket a write is charged to."""
+    monkeypatch.setattr(app_module, 'admission', AdmissionController(rate=0.1, burst=1, max_in_flight=4))
+    body = {'volume': 10, 'destination': 'CityB', 'sender_name': 'S', 'sender_address': 'SA',
+            'receiver_name': 'R', 'receiver_address': 'RA'}
+    client.post('/login', data={'username': 'employee1', 'password': 'employeepass'})
+    assert client.post('/consignments', json=dict(body, branch_id='branch-capital')).status_code == 201
+    assert client.post('/consignments', json=dict(body, branch_id='junk-1')).status_code == 429
+    client.get('/logout')
+    client.post('/login', data={'username': 'manager1', 'password': 'managerpass'})
+    assert client.post('/consignments', json=dict(body, branch_id='branch-capital')).status_code == 201
+    assert client.post('/trucks', json={'location': 'Depot', 'branch_id': 'junk-2'}).status_code == 400
+    stats = client.get('/admission/stats').get_json()['branches']
+    assert set(stats) == {'branch-citya', 'branch-capital', f'user:{ensure_manager_exists.id}'}
+    assert stats['branch-citya'] == {'admitted': 1, 'shed_rate': 1, 'shed_in_flight': 0, 'in_flight': {}}
+    assert stats['branch-capital']['admitted'] == 1
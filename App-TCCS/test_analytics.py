@@ -0,0 +1,60 @@
+# tests/test_analytics.py
+
+import pytest
+from datetime import datetime
+import app as app_module
+from app import Consignment
+from analytics import ConsignmentCube
+
+def test_cube_group_by_and_update_in_place():
+    """Test group-bys over dictionary and time dimensions, and in-place row updates."""
+    cube = ConsignmentCube()
+    # Days since epoch: 19723 = 2024-01-01 (Monday), 19754 = 2024-02-01.
+    cube.add(['c1', 'c2', 'c3'], ['b1', 'b1', 'b2'], ['X', 'Y', 'X'], ['Pending'] * 3,
+             [19723, 19724, 19754], [10, 20, 30], [100, 200, 300])
+    cube.add(['c2'], ['b1'], ['Y'], ['Dispatched'], [19724], [20], [200])
+    assert cube.size == 3
+
+    rows = cube.query(['branch', 'month'], ['volume', 'count'])
+    assert rows == [
+        {'branch': 'b1', 'month': '2024-01', 'volume': 30.0, 'count': 2},
+        {'branch': 'b2', 'month': '2024-02', 'volume': 30.0, 'count': 1},
+    ]
+    assert cube.query(['status'], ['count'], filters={'branch': 'b1'}) == [
+        {'status': 'Pending', 'count': 1}, {'status': 'Dispatched', 'count': 1}
+    ]
+    assert cube.query(['week'], ['revenue'], start_day=19723, end_day=19754) == [
+        {'week': '2024-01-01', 'revenue': 300.0}
+    ]
+    assert cube.query([], ['count']) == [{'count': 3}]
+
+def test_cube_report_endpoint_refreshes_incrementally(logged_in_manager, db_session, monkeypatch):
+    """Test /reports/cube picks up new and newly dispatched consignments."""
+    monkeypatch.setattr(app_module, 'cube', ConsignmentCube())
+    def add(cons_id, destination, volume, status='Pending'):
+        db_session.add(Consignment(id=cons_id, volume=volume, destination=destination, sender_name='S',
+                                   sender_address='SA', receiver_name='R', receiver_address='RA', charge=volume * 10,
+                                   branch_id='branch-citya', status=status, created_at=datetime(2024, 3, 5)))
+        db_session.commit()
+
+    add('cons-cube-1', 'Capital', 10)
+    response = logged_in_manager.get('/reports/cube?group_by=destination,status&metrics=volume,count')
+    assert response.status_code == 200
+    assert response.get_json()['rows'] == [{'destination': 'Capital', 'status': 'Pending', 'volume': 10.0, 'count': 1}]
+
+    add('cons-cube-2', 'CityB', 5)
+    cons = db_session.get(Consignment, 'cons-cube-1')
+    cons.status = 'Dispatched'
+    cons.dispatched_at = datetime.utcnow()
+    db_session.commit()
+    response = logged_in_manager.get('/reports/cube?group_by=status,month&metrics=count')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    rows = response.get_json()['rows']
+    assert sorted((r['status'], r['month'], r['count']) for r in rows) == [
+        ('Dispatched', '2024-03', 1), ('Pending', '2024-03', 1)
+    ]
+
+def test_cube_report_rejects_unknown_dimension(logged_in_manager, db_session):
+    """Test invalid group_by values are rejected."""
+    response = logged_in_manager.get('/reports/cube?group_by=colour')
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+# tests/test_archive.py
+
+import pytest
+from datetime import datetime, timedelta
+from app import app as flask_app, Consignment, ConsignmentTruck, Truck, archive_consignments, get_archive
+from archive import ArchiveStore
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    return tmp_path / 'archive'
+
+def dispatched(days_ago):
+    """Fields for a consignment dispatched ``days_ago`` days ago after waiting four hours."""
+    dispatched_at = datetime.utcnow() - timedelta(days=days_ago)
+    return {'sender_name': 'Sender ü', 'dispatched_at': dispatched_at,
+            'created_at': dispatched_at - timedelta(hours=4)}
+
+def test_archive_store_round_trip(tmp_path):
+    """Test rows written to a partition read back unchanged and re-appends are ignored."""
+    store = ArchiveStore(str(tmp_path))
+    row = {'id': 'c1', 'volume': 2.5, 'charge': 25.0, 'created_at': 1704067200, 'dispatched_at': 1704070800,
+           'destination': 'CityB', 'status': 'Dispatched', 'truck_id': None, 'sender_name': 'Zoë',
+           'sender_address': '', 'receiver_name': 'R', 'receiver_address': 'RA', 'branch_id': 'b1'}
+    store.append([row])
+    store.append([row, dict(row, id='c2')])
+    partitions = store.partitions()
+    assert [(p.month, p.branch_id, p.rows) for p in partitions] == [('2024-01', 'b1', 2)]
+    assert partitions[0].to_rows()[0] == row
+
+def test_archive_job_moves_old_dispatched_consignments(archive_dir, db_session, ensure_truck_citya1_exists, make_consignment):
+    """Test only old dispatched consignments leave the live table."""
+    truck = ensure_truck_citya1_exists
+    db_session.add_all([
+        make_consignment('cons-old', status='Dispatched', **dispatched(200)),
+        make_consignment('cons-recent', status='Dispatched', **dispatched(1)),
+        make_consignment('cons-pending', status='Pending', **dispatched(200)),
+    ])
+    db_session.add(ConsignmentTruck(consignment_id='cons-old', truck_id=truck.id))
+    db_session.commit()
+
+    assert archive_consignments(older_than_days=90) == 1
+    remaining = {c.id for c in db_session.query(Consignment).all()}
+    assert remaining == {'cons-recent', 'cons-pending'}
+    assert db_session.query(ConsignmentTruck).count() == 0
+    partitions = get_archive().partitions()
+    assert [p.branch_id for p in partitions] == ['branch-citya']
+    assert partitions[0].strings('id') == ['cons-old']
+
+def test_reports_union_archive(archive_dir, logged_in_manager, db_session, ensure_truck_citya1_exists, make_consignment):
+    """Test report endpoints include archived consignments."""
+    truck = ensure_truck_citya1_exists
+    db_session.add_all([make_consignment('cons-arch', volume=20, status='Dispatched', **dispatched(100)),
+                        make_consignment('cons-live', volume=30, status='Dispatched', **dispatched(1))])
+    db_session.add_all([ConsignmentTruck(consignment_id='cons-arch', truck_id=truck.id),
+                        ConsignmentTruck(consignment_id='cons-live', truck_id=truck.id)])
+    db_session.commit()
+    archive_consignments(older_than_days=90)
+
+    report = logged_in_manager.get('/reports/consignments?destination=CityB').get_json()
+    assert report == {'count': 2, 'total_volume': 50, 'total_revenue': 750}
+    usage = {u['truck_id']: u for u in logged_in_manager.get('/reports/usage?days=365').get_json()}
+    assert usage[truck.id]['consignments_handled'] == 2
+    assert usage[truck.id]['total_volume'] == 50
+    waiting = logged_in_manager.get('/reports/waiting').get_json()
+    assert waiting['avg_waiting_time_hours'] == pytest.approx(4)
+
+def test_archive_segments_merge_dictionaries_and_keep_snapshots(tmp_path):
+    """Test appends add segments whose codes remap onto one dictionary, without disturbing open partitions."""
+    store = ArchiveStore(str(tmp_path))
+    row = {'id': 'c1', 'volume': 1.0, 'charge': 10.0, 'created_at': 1704067200, 'dispatched_at': 1704070800,
+           'destination': 'CityB', 'status': 'Dispatched', 'truck_id': 't1', 'sender_name': 'S',
+           'sender_address': 'SA', 'receiver_name': 'R', 'receiver_address': 'RA', 'branch_id': 'b1'}
+    store.append([row])
+    before = store.partitions()[0]
+    store.append([dict(row, id='c2', destination='Capital', truck_id=None, volume=2.0)])
+    store.append([dict(row, id='c3', destination='CityB', truck_id='t0', volume=4.0), dict(row, id='c2')])
+    assert before.rows == 1 and before.strings('id') == ['c1']
+    partition = store.partitions()[0]
+    assert len(partition.segments) == 3
+    assert partition.strings('id') == ['c1', 'c2', 'c3']
+    assert partition.dictionaries['destination'] == ['Capital', 'CityB']
+    assert [partition.dictionaries['destination'][code] for code in partition.column('destination')] == \
+        ['CityB', 'Capital', 'CityB']
+    assert partition.column('truck_id').tolist() == [1, -1, 0]
+    assert partition.column('volume').tolist() == [1.0, 2.0, 4.0]
+    assert store.usage_by_truck(0) == {'t0': (1, 4.0), 't1': (1, 1.0)}
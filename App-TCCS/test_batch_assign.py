@@ -0,0 +1,147 @@
+# tests/test_batch_assign.py
+
+import pytest
+import app as app_module
+from app import Consignment, ConsignmentTruck, Truck, TruckAssignment
+from sharding import current_shard
+from test_sharding import add_consignment, sharded
+
+@pytest.fixture
+def batch_fixtures(db_session, make_consignment):
+    db_session.add_all([
+        Truck(id='truck-a', location='Depot A', branch_id='branch-citya'),
+        Truck(id='truck-b', location='Depot B', branch_id='branch-citya'),
+        Truck(id='truck-cap', location='Depot C', branch_id='branch-capital'),
+        make_consignment('cons-1', 300),
+        make_consignment('cons-2', 150),
+        make_consignment('cons-3', 100),
+        make_consignment('cons-done', 10, status='Dispatched'),
+    ])
+    db_session.commit()
+
+def test_consignment_batch_all_or_nothing_rolls_back(logged_in_manager, db_session, batch_fixtures):
+    """Test a failing item in all_or_nothing mode leaves every consignment untouched."""
+    response = logged_in_manager.post('/consignments/assign/batch', json={'assignments': [
+        {'consignment_id': 'cons-1', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-2', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-3', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-done', 'truck_id': 'truck-b'},
+    ]})
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['assigned'] == 0
+    assert [r['status'] for r in data['results']] == ['skipped', 'skipped', 'error', 'error']
+    assert 'exceed truck capacity' in data['results'][2]['error']
+    assert data['results'][3]['error'] == 'Consignment must be in Pending status'
+    db_session.expire_all()
+    assert db_session.query(ConsignmentTruck).count() == 0
+    assert db_session.get(Consignment, 'cons-1').status == 'Pending'
+
+def test_consignment_batch_all_or_nothing_rejects_malformed_item(logged_in_manager, db_session, batch_fixtures):
+    """Test a malformed item in all_or_nothing mode keeps the valid items from being committed."""
+    response = logged_in_manager.post('/consignments/assign/batch', json={'assignments': [
+        {'consignment_id': 'cons-1', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-2'},
+    ]})
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['assigned'] == 0
+    assert [r['status'] for r in data['results']] == ['skipped', 'error']
+    assert data['results'][1]['error'] == 'Consignment ID and Truck ID required'
+    db_session.expire_all()
+    assert db_session.query(ConsignmentTruck).count() == 0
+    assert db_session.get(Consignment, 'cons-1').status == 'Pending'
+
+def test_consignment_batch_best_effort_applies_valid_items(logged_in_manager, db_session, batch_fixtures):
+    """Test best_effort commits valid items and reports the rest per item."""
+    response = logged_in_manager.post('/consignments/assign/batch', json={'mode': 'best_effort', 'assignments': [
+        {'consignment_id': 'cons-1', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-2', 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-3', 'truck_id': 'truck-cap'},
+        {'consignment_id': 'missing', 'truck_id': 'truck-a'},
+        {'truck_id': 'truck-a'},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['assigned'] == 2
+    assert [r['error'] for r in data['results']] == [
+        None, None,
+        'Consignment and truck must be in the same branch',
+        'Invalid consignment or truck ID',
+        'Consignment ID and Truck ID required',
+    ]
+    db_session.expire_all()
+    assert db_session.get(Consignment, 'cons-2').status == 'Dispatched'
+    assert db_session.get(Truck, 'truck-a').status == 'In-Transit'
+    assert db_session.query(ConsignmentTruck).filter_by(truck_id='truck-a').count() == 2
+
+def test_truck_batch_assign(logged_in_manager, db_session, batch_fixtures, ensure_employee_exists):
+    """Test truck batch assignment validates employees and commits atomically."""
+    employee_id = ensure_employee_exists.id
+    response = logged_in_manager.post('/trucks/assign/batch', json={'assignments': [
+        {'truck_id': 'truck-a', 'employee_id': employee_id},
+        {'truck_id': 'truck-b', 'employee_id': employee_id},
+    ]})
+    assert response.status_code == 201
+    assert response.get_json()['assigned'] == 2
+    assert db_session.query(TruckAssignment).filter_by(employee_id=employee_id).count() == 2
+
+    response = logged_in_manager.post('/trucks/assign/batch', json={'assignments': [
+        {'truck_id': 'truck-cap', 'employee_id': employee_id},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'Truck and employee must be in the same branch'
+
+def test_batch_rejects_non_string_ids(logged_in_manager, db_session, batch_fixtures, ensure_employee_exists):
+    """Test ids that are not non-empty strings get the per-item error instead of a server error."""
+    response = logged_in_manager.post('/consignments/assign/batch', json={'mode': 'best_effort', 'assignments': [
+        {'consignment_id': ['cons-1'], 'truck_id': 'truck-a'},
+        {'consignment_id': 'cons-2', 'truck_id': {'id': 'truck-a'}},
+        {'consignment_id': 'cons-3', 'truck_id': 'truck-a'},
+    ]})
+    assert response.status_code == 200
+    assert [r['error'] for r in response.get_json()['results']] == [
+        'Consignment ID and Truck ID required', 'Consignment ID and Truck ID required', None
+    ]
+    response = logged_in_manager.post('/trucks/assign/batch', json={'assignments': [
+        {'truck_id': 'truck-a', 'employee_id': [ensure_employee_exists.id]},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'Truck ID and Employee ID required'
+
+def test_cross_shard_batch_reports_committed_items(sharded, logged_in_manager, db_session, monkeypatch):
+    """Test an all-or-nothing batch that fails in one shard after another committed reports what was written."""
+    trucks = {}
+    for branch_id in ('branch-citya', 'branch-capital'):
+        add_consignment(logged_in_manager, branch_id)
+        response = logged_in_manager.post('/trucks', json={'location': 'Depot', 'branch_id': branch_id})
+        trucks[branch_id] = response.get_json()['truck_id']
+    consignments = {c['branch_id']: {'consignment_id': c['id'], 'truck_id': trucks[c['branch_id']]}
+                    for c in logged_in_manager.get('/consignments').get_json()}
+    apply = app_module.apply_consignment_batch
+    def apply_after_concurrent_dispatch(pending, scope):
+        # Another request dispatches Capital's consignment between the two passes.
+        if scope == 'shard' and current_shard() == 'branch-capital':
+            consignment_id = consignments['branch-capital']['consignment_id']
+            app_module.db.session.get(Consignment, consignment_id).status = 'Dispatched'
+            app_module.db.session.commit()
+        return apply(pending, scope)
+    monkeypatch.setattr(app_module, 'apply_consignment_batch', apply_after_concurrent_dispatch)
+    response = logged_in_manager.post('/consignments/assign/batch', json={'assignments': [
+        consignments['branch-citya'], consignments['branch-capital']
+    ]})
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data['assigned'] == 1
+    assert [r['status'] for r in data['results']] == ['assigned', 'error']
+    assert data['results'][1]['error'] == 'Consignment must be in Pending status'
+    statuses = {c['id']: c['status'] for c in logged_in_manager.get('/consignments').get_json()}
+    assert statuses[consignments['branch-citya']['consignment_id']] == 'Dispatched'
+
+def test_batch_rejects_bad_requests(logged_in_manager):
+    """Test batch endpoints validate the request body."""
+    response = logged_in_manager.post('/consignments/assign/batch', json={'assignments': []})
+    assert response.status_code == 400
+    response = logged_in_manager.post('/trucks/assign/batch', json={'assignments': [{}], 'mode': 'sometimes'})
+    assert response.status_code == 400
@@ -0,0 +1,55 @@
+# tests/test_candidates.py
+
+import pytest
+from app import ConsignmentTruck, Truck, User
+
+def test_truck_candidates_filter_by_free_capacity(logged_in_manager, db_session, make_consignment):
+    """Test truck candidates are branch-scoped and exclude full trucks."""
+    db_session.add_all([
+        Truck(id='truck-empty', location='Depot A', branch_id='branch-citya'),
+        Truck(id='truck-half', location='Depot B', branch_id='branch-citya'),
+        Truck(id='truck-full', location='Depot C', branch_id='branch-citya'),
+        Truck(id='truck-other', location='Depot D', branch_id='branch-capital'),
+        make_consignment('cons-half', 250, status='Dispatched'),
+        make_consignment('cons-full', 500, status='Dispatched'),
+        ConsignmentTruck(consignment_id='cons-half', truck_id='truck-half'),
+        ConsignmentTruck(consignment_id='cons-full', truck_id='truck-full'),
+    ])
+    db_session.commit()
+
+    response = logged_in_manager.get('/candidates/trucks?branch_id=branch-citya')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 200
+    assert [t['id'] for t in response.get_json()] == ['truck-empty', 'truck-half']
+    assert set(response.get_json()[0]) == {'id', 'label'}
+
+    response = logged_in_manager.get('/candidates/trucks?branch_id=branch-citya&min_free=300')
+    assert [t['id'] for t in response.get_json()] == ['truck-empty']
+    response = logged_in_manager.get('/candidates/trucks?branch_id=branch-citya&q=Depot%20B')
+    assert [t['id'] for t in response.get_json()] == ['truck-half']
+
+def test_consignment_candidates_search_and_limit(logged_in_manager, db_session, make_consignment):
+    """Test consignment candidates filter by status, search prefix and limit."""
+    db_session.add_all([
+        make_consignment('cons-a', 10, receiver_name='Alice'),
+        make_consignment('cons-b', 20, receiver_name='Bob'),
+        make_consignment('cons-c', 30, status='Dispatched', receiver_name='Alice'),
+        make_consignment('cons-d', 40, branch_id='branch-capital', receiver_name='Alice'),
+    ])
+    db_session.commit()
+
+    response = logged_in_manager.get('/candidates/consignments?branch_id=branch-citya&status=Pending')
+    assert sorted(c['id'] for c in response.get_json()) == ['cons-a', 'cons-b']
+    response = logged_in_manager.get('/candidates/consignments?branch_id=branch-citya&q=ali')
+    assert [c['id'] for c in response.get_json()] == ['cons-a']
+    response = logged_in_manager.get('/candidates/consignments?branch_id=branch-citya&limit=1')
+    assert len(response.get_json()) == 1
+
+def test_employee_candidates_require_branch(logged_in_manager, db_session, ensure_employee_exists):
+    """Test employee candidates list only employees of the branch."""
+    response = logged_in_manager.get('/candidates/employees')
+    assert response.status_code == 400
+    response = logged_in_manager.get('/candidates/employees?branch_id=branch-citya')
+    assert response.get_json() == [{'id': ensure_employee_exists.id, 'label': 'Username: employee1'}]
+    response = logged_in_manager.get('/candidates/employees?branch_id=branch-capital')
+    assert response.get_json() == []
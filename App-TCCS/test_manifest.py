@@ -0,0 +1,66 @@
+# tests/test_manifest.py
+
+import pytest
+import app as app_module
+from datetime import datetime
+from app import Consignment, Truck
+from manifest import ManifestCache
+
+@pytest.fixture
+def dispatched_truck(db_session, monkeypatch):
+    monkeypatch.setattr(app_module, 'manifest_cache', ManifestCache())
+    db_session.add_all([
+        Truck(id='truck-m1', location='Depot A', branch_id='branch-citya'),
+        Truck(id='truck-m2', location='Depot B', branch_id='branch-citya'),
+    ] + [
+        Consignment(id=f'cons-m{i}', volume=10, destination='CityB', sender_name='Sender <&>',
+                    sender_address='1 Main St', receiver_name=f'Receiver {i}', receiver_address='2 High St',
+                    charge=150, branch_id='branch-citya')
+        for i in range(3)
+    ])
+    db_session.commit()
+
+def assign(client, consignment_id, truck_id):
+    response = client.post('/consignments/assign', json={'consignment_id': consignment_id, 'truck_id': truck_id})
+    assert response.status_code == 201
+
+def test_truck_manifest_is_cached_until_next_dispatch(logged_in_manager, db_session, dispatched_truck):
+    """Test the manifest lists dispatched consignments and reprints come from the cache."""
+    assign(logged_in_manager, 'cons-m0', 'truck-m1')
+    response = logged_in_manager.get('/trucks/truck-m1/manifest')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.data.decode()
+    assert 'cons-m0' in text and 'Receiver 0' in text and 'Consignments: 1' in text
+    assert logged_in_manager.get('/trucks/truck-m1/manifest').data == response.data
+    assert app_module.manifest_cache.hits == 1
+
+    assign(logged_in_manager, 'cons-m1', 'truck-m1')
+    text = logged_in_manager.get('/trucks/truck-m1/manifest').data.decode()
+    assert 'cons-m1' in text and 'Consignments: 2' in text
+    assert db_session.get(Truck, 'truck-m1').dispatch_version == 2
+
+def test_truck_manifest_html_escapes(logged_in_manager, dispatched_truck):
+    """Test the HTML manifest is a printable page with escaped fields."""
+    assign(logged_in_manager, 'cons-m0', 'truck-m1')
+    response = logged_in_manager.get('/trucks/truck-m1/manifest?format=html')
+    assert response.mimetype == 'text/html'
+    assert 'Sender &lt;&amp;&gt;' in response.data.decode()
+    assert logged_in_manager.get('/trucks/truck-m1/manifest?format=pdf').status_code == 400
+    assert logged_in_manager.get('/trucks/missing/manifest').status_code == 404
+
+def test_batch_manifests_for_branch_and_date(logged_in_manager, dispatched_truck):
+    """Test the batch lists one manifest per truck dispatched on the date."""
+    assign(logged_in_manager, 'cons-m0', 'truck-m1')
+    assign(logged_in_manager, 'cons-m2', 'truck-m2')
+    today = datetime.utcnow().date().isoformat()
+    response = logged_in_manager.get(f'/manifests?branch_id=branch-citya&date={today}')
+    assert response.status_code == 200
+    assert response.is_streamed
+    pages = response.data.decode().split('\f\n')
+    assert [p for p in pages if 'DISPATCH MANIFEST' in p] == pages[:2]
+    assert 'truck-m1' in pages[0] and 'truck-m2' in pages[1]
+    response = logged_in_manager.get('/manifests?branch_id=branch-citya&date=2000-01-01')
+    assert response.data == b''
+    assert logged_in_manager.get('/manifests').status_code == 400
@@ -0,0 +1,26 @@
+# tests/test_readpath.py
+
+import json
+from datetime import datetime
+from readpath import RowMapper, dumps, json_response
+
+def test_row_mapper_zips_rows_into_dicts():
+    """Test rows map onto the route's keys in order."""
+    mapper = RowMapper('id', 'volume')
+    assert mapper.all([('a', 1.0), ('b', 2.5)]) == [{'id': 'a', 'volume': 1.0}, {'id': 'b', 'volume': 2.5}]
+    assert mapper.one(('c', 3.0)) == {'id': 'c', 'volume': 3.0}
+
+def test_dumps_matches_isoformat_for_datetimes():
+    """Test datetimes are encoded the way the routes used to format them."""
+    created = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert json.loads(dumps({'created_at': created, 'count': 2})) == {
+        'created_at': created.isoformat(), 'count': 2
+    }
+    assert json.loads(dumps([datetime(2024, 5, 1)])) == ['2024-05-01T00:00:00']
+
+def test_json_response(app):
+    """Test json_response sets the JSON mimetype and status."""
+    response = json_response({'error': 'x'}, status=400)
+    assert response.status_code == 400
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {'error': 'x'}
@@ -0,0 +1,94 @@
+# tests/test_routing.py
+
+import pytest
+import app as app_module
+from app import Branch, BranchRoute, Consignment, Truck, ConsignmentTruck
+from routing import shortest_path_matrix, plan_route
+
+def test_shortest_path_matrix_uses_intermediate_branches():
+    """Test distances and paths go through cheaper intermediate branches."""
+    matrix = shortest_path_matrix(['a', 'b', 'c', 'd'], [('a', 'b', 1), ('b', 'c', 2), ('a', 'c', 10)])
+    assert matrix.distance('a', 'c') == 3
+    assert matrix.distance('c', 'a') == 3
+    assert matrix.path('a', 'c') == ['a', 'b', 'c']
+    assert matrix.distance('a', 'd') == float('inf')
+    assert matrix.path('a', 'd') == []
+
+def test_plan_route_orders_stops_and_reports_unreachable():
+    """Test planner visits stops along the line and flags isolated branches."""
+    matrix = shortest_path_matrix(['a', 'b', 'c', 'd', 'e'], [('a', 'b', 1), ('b', 'c', 1), ('c', 'd', 1)])
+    order, unreachable = plan_route(matrix, 'a', ['d', 'b', 'c', 'e'])
+    assert order == ['b', 'c', 'd']
+    assert unreachable == ['e']
+
+def test_truck_route_endpoint(logged_in_manager, db_session):
+    """Test /trucks/<id>/route builds a multi-stop route from the truck's consignments."""
+    print("\n--- Test: test_truck_route_endpoint ---")
+    db_session.add_all([Branch(id='branch-cityb', location='CityB'), Branch(id='branch-cityc', location='CityC')])
+    db_session.commit()
+    for from_id, to_id, distance in [('branch-capital', 'branch-citya', 100), ('branch-citya', 'branch-cityb', 50),
+                                     ('branch-capital', 'branch-cityb', 400)]:
+        response = logged_in_manager.post('/branches/routes', json={
+            'from_branch_id': from_id, 'to_branch_id': to_id, 'distance': distance
+        })
+        assert response.status_code == 201
+
+    truck = Truck(id='truck-route', location='Capital', branch_id='branch-capital', status='In-Transit')
+    db_session.add(truck)
+    for cons_id, destination in [('cons-route-b', 'CityB'), ('cons-route-a', 'CityA'),
+                                 ('cons-route-c', 'CityC'), ('cons-route-x', 'Nowhere')]:
+        db_session.add(Consignment(id=cons_id, volume=10, destination=destination, sender_name='S', sender_address='SA',
+                                   receiver_name='R', receiver_address='RA', charge=1, branch_id='branch-capital',
+                                   status='Dispatched'))
+        db_session.add(ConsignmentTruck(consignment_id=cons_id, truck_id=truck.id))
+    db_session.commit()
+
+    response = logged_in_manager.get('/trucks/truck-route/route')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['start_branch_id'] == 'branch-capital'
+    assert [s['branch_id'] for s in data['stops']] == ['branch-citya', 'branch-cityb']
+    assert data['stops'][1]['path'] == ['branch-citya', 'branch-cityb']
+    assert data['total_distance'] == 150
+    assert sorted(u['destination'] for u in data['unroutable']) == ['CityC', 'Nowhere']
+
+def test_add_branch_route_rejects_unknown_branch(logged_in_manager, db_session):
+    """Test adding a route to a missing branch fails."""
+    response = logged_in_manager.post('/branches/routes', json={
+        'from_branch_id': 'branch-capital', 'to_branch_id': 'branch-missing', 'distance': 10
+    })
+    assert response.status_code == 400
+    assert b"Invalid branch_id" in response.data
+
+def test_distance_cache_invalidated_on_commit_only(db_session):
+    """Test branch graph changes drop the cached matrix when committed, not when flushed or rolled back."""
+    cache = app_module.distance_cache
+    matrix = cache.get()
+    db_session.add(BranchRoute(from_branch_id='branch-capital', to_branch_id='branch-citya', distance=5))
+    db_session.flush()
+    assert cache.get() is matrix
+    db_session.rollback()
+    assert cache.get() is matrix
+    db_session.add(BranchRoute(from_branch_id='branch-capital', to_branch_id='branch-citya', distance=5))
+    db_session.commit()
+    rebuilt = cache.get()
+    assert rebuilt is not matrix
+    assert rebuilt.distance('branch-capital', 'branch-citya') == 5
+
+def test_truck_route_keeps_entered_distances(logged_in_manager, db_session):
+    """Test fractional kilometres come back as entered rather than with float32 noise."""
+    db_session.add(Branch(id='branch-cityb', location='CityB'))
+    db_session.add_all([BranchRoute(from_branch_id='branch-capital', to_branch_id='branch-citya', distance=12.3),
+                        BranchRoute(from_branch_id='branch-citya', to_branch_id='branch-cityb', distance=7.1)])
+    db_session.add(Truck(id='truck-frac', location='Capital', branch_id='branch-capital', status='In-Transit'))
+    for cons_id, destination in [('cons-frac-a', 'CityA'), ('cons-frac-b', 'CityB')]:
+        db_session.add(Consignment(id=cons_id, volume=10, destination=destination, sender_name='S', sender_address='SA',
+                                   receiver_name='R', receiver_address='RA', charge=1, branch_id='branch-capital',
+                                   status='Dispatched'))
+        db_session.add(ConsignmentTruck(consignment_id=cons_id, truck_id='truck-frac'))
+    db_session.commit()
+    data = logged_in_manager.get('/trucks/truck-frac/route').get_json()
+    assert [s['leg_distance'] for s in data['stops']] == [12.3, 7.1]
+    assert data['total_distance'] == 19.4
+    assert app_module.distance_cache.get().distance('branch-capital', 'branch-cityb') == 12.3 + 7.1
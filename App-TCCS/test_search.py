@@ -0,0 +1,68 @@
+# tests/test_search.py
+
+import pytest
+from sqlalchemy import text
+from app import Consignment
+from search import match_expression
+
+def test_match_expression_quotes_terms():
+    """Test user input becomes quoted prefix terms and FTS syntax is stripped."""
+    assert match_expression('Ali  baker-st') == '"Ali"* "baker"* "st"'
+    assert match_expression('name:"x" OR') == '"name"* "x" "OR"'
+    assert match_expression(' *" ') is None
+
+def test_search_prefix_ranking_and_pagination(logged_in_manager, db_session, make_consignment):
+    """Test prefix search across indexed columns with ranked, paginated results."""
+    db_session.add_all([
+        make_consignment('cons-s1', sender_name='Alice Baker', receiver_address='5 Harbour Road'),
+        make_consignment('cons-s2', sender_name='Alina Stone', receiver_address='9 Alice Street'),
+        make_consignment('cons-s3', sender_name='Bob Carter', receiver_address='7 Mill Lane', branch_id='branch-capital'),
+        make_consignment('cons-s4', sender_name='Carol Alison', receiver_address='3 Harbour View', destination='Harbourtown'),
+    ])
+    db_session.commit()
+
+    response = logged_in_manager.get('/consignments/search?q=ali')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {r['id'] for r in data['results']} == {'cons-s1', 'cons-s2', 'cons-s4'}
+    assert [r['rank'] for r in data['results']] == sorted(r['rank'] for r in data['results'])
+
+    response = logged_in_manager.get('/consignments/search?q=harb ali&limit=1')
+    data = response.get_json()
+    assert len(data['results']) == 1 and data['next_offset'] == 1
+    response = logged_in_manager.get('/consignments/search?q=harb ali&limit=1&offset=1')
+    data = response.get_json()
+    assert len(data['results']) == 1 and data['next_offset'] is None
+    assert logged_in_manager.get('/consignments/search?q=').status_code == 400
+
+def test_search_index_follows_updates_and_branch_scope(logged_in_manager, db_session, make_consignment):
+    """Test updates reindex the row and branch_id scopes the search."""
+    db_session.add_all([
+        make_consignment('cons-s5', sender_name='Dmitri Volkov', receiver_address='1 Quay'),
+        make_consignment('cons-s6', sender_name='Dmitri Petrov', receiver_address='2 Quay', branch_id='branch-capital'),
+    ])
+    db_session.commit()
+    response = logged_in_manager.get('/consignments/search?q=dmitri&branch_id=branch-capital')
+    assert [r['id'] for r in response.get_json()['results']] == ['cons-s6']
+
+    db_session.get(Consignment, 'cons-s5').sender_name = 'Yuri Volkov'
+    db_session.commit()
+    response = logged_in_manager.get('/consignments/search?q=dmitri')
+    assert [r['id'] for r in response.get_json()['results']] == ['cons-s6']
+    response = logged_in_manager.get('/consignments/search?q=yur')
+    assert [r['id'] for r in response.get_json()['results']] == ['cons-s5']
+
+def test_search_index_survives_rowid_renumbering(logged_in_manager, db_session, make_consignment):
+    """Test rows keep their index entries when their implicit rowids change, as VACUUM may do."""
+    db_session.add_all([make_consignment('cons-vz', sender_name='Zelda Marsh', receiver_address='8 Quay'),
+                        make_consignment('cons-vy', sender_name='Yannick Ferro', receiver_address='7 Quay')])
+    db_session.commit()
+    db_session.execute(text('UPDATE consignment SET rowid = rowid + 1000'))
+    db_session.commit()
+    db_session.add(make_consignment('cons-vn', sender_name='Newton Marsh', receiver_address='9 Quay'))
+    db_session.commit()
+    response = logged_in_manager.get('/consignments/search?q=marsh')
+    assert sorted(r['id'] for r in response.get_json()['results']) == ['cons-vn', 'cons-vz']
+    response = logged_in_manager.get('/consignments/search?q=ferro')
+    assert [r['id'] for r in response.get_json()['results']] == ['cons-vy']
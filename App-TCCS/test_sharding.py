@@ -0,0 +1,89 @@
+# tests/test_sharding.py
+
+import sqlite3
+import pytest
+from sqlalchemy import func, select
+from app import app as flask_app, db as sqlalchemy_db, SHARDED_TABLES, Consignment, branch_in_catalog
+from sharding import ShardRouter
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    router = ShardRouter(str(tmp_path / 'shards'), sqlalchemy_db.metadata, SHARDED_TABLES, max_workers=2,
+                         branch_exists=branch_in_catalog)
+    monkeypatch.setitem(flask_app.extensions, 'shard_router', router)
+    return tmp_path / 'shards'
+
+def add_consignment(client, branch_id, destination='CityB', volume=10):
+    response = client.post('/consignments', json={
+        'volume': volume, 'destination': destination, 'sender_name': 'S', 'sender_address': 'SA',
+        'receiver_name': 'R', 'receiver_address': 'RA', 'branch_id': branch_id
+    })
+    assert response.status_code == 201
+    return response
+
+def shard_rows(shard_dir, branch_id, table):
+    conn = sqlite3.connect(shard_dir / f'{branch_id}.db')
+    try:
+        return conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_writes_route_to_branch_shards(sharded, logged_in_manager, db_session):
+    """Test consignments land in their branch's database, not the catalog."""
+    print("\n--- Test: test_writes_route_to_branch_shards ---")
+    add_consignment(logged_in_manager, 'branch-citya')
+    add_consignment(logged_in_manager, 'branch-citya')
+    add_consignment(logged_in_manager, 'branch-capital')
+    assert shard_rows(sharded, 'branch-citya', 'consignment') == 2
+    assert shard_rows(sharded, 'branch-capital', 'consignment') == 1
+    with sqlalchemy_db.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Consignment.__table__)).scalar() == 0
+
+def test_manager_reads_fan_out_and_merge(sharded, logged_in_manager, db_session):
+    """Test manager-wide endpoints merge results from every shard."""
+    add_consignment(logged_in_manager, 'branch-citya', volume=10)
+    add_consignment(logged_in_manager, 'branch-capital', volume=20)
+    for branch_id in ('branch-citya', 'branch-capital'):
+        response = logged_in_manager.post('/trucks', json={'location': 'Depot', 'branch_id': branch_id})
+        assert response.status_code == 201
+
+    consignments = logged_in_manager.get('/consignments').get_json()
+    assert sorted(c['branch_id'] for c in consignments) == ['branch-capital', 'branch-citya']
+    trucks = logged_in_manager.get('/trucks').get_json()
+    assert sorted(t['branch_id'] for t in trucks) == ['branch-capital', 'branch-citya']
+    report = logged_in_manager.get('/reports/consignments').get_json()
+    assert report['count'] == 2
+    assert report['total_volume'] == 30
+
+def test_assign_consignment_across_shards(sharded, logged_in_manager, db_session):
+    """Test assignment locates rows in their shard and rejects cross-branch pairs."""
+    add_consignment(logged_in_manager, 'branch-citya')
+    consignment_id = logged_in_manager.get('/consignments').get_json()[0]['id']
+    local_truck = logged_in_manager.post('/trucks', json={'location': 'Depot', 'branch_id': 'branch-citya'}).get_json()['truck_id']
+    other_truck = logged_in_manager.post('/trucks', json={'location': 'Depot', 'branch_id': 'branch-capital'}).get_json()['truck_id']
+
+    response = logged_in_manager.post('/consignments/assign', json={'consignment_id': consignment_id, 'truck_id': other_truck})
+    assert response.status_code == 400
+    assert b"same branch" in response.data
+
+    response = logged_in_manager.post('/consignments/assign', json={'consignment_id': consignment_id, 'truck_id': local_truck})
+    assert response.status_code == 201
+    assert shard_rows(sharded, 'branch-citya', 'consignment_truck') == 1
+    assert logged_in_manager.get(f'/consignments/{consignment_id}').get_json()['status'] == 'Dispatched'
+
+def test_unknown_branches_never_create_shards(sharded, logged_in_manager, db_session):
+    """Test unknown or path-like branch ids are rejected before a shard file is opened."""
+    assert logged_in_manager.get('/candidates/trucks?branch_id=../escaped').status_code == 400
+    assert logged_in_manager.get('/consignments/search?q=Smith&branch_id=branch-typo').status_code == 400
+    response = logged_in_manager.post('/consignments', json={
+        'volume': 10, 'destination': 'CityB', 'sender_name': 'S', 'sender_address': 'SA',
+        'receiver_name': 'R', 'receiver_address': 'RA', 'branch_id': 'branch-typo'
+    })
+    assert response.status_code == 400
+    router = flask_app.extensions['shard_router']
+    with flask_app.app_context():
+        for branch_id in ('../escaped', 'branch-typo', ''):
+            with pytest.raises(ValueError):
+                router.engine_for(branch_id)
+    assert not (sharded.parent / 'escaped.db').exists()
+    assert not sharded.exists() or sorted(p.name for p in sharded.iterdir() if p.suffix == '.db') == []
@@ -0,0 +1,60 @@
+# tests/test_simulator.py
+
+import pytest
+from simulator import (Arrival, CapacityAwarePolicy, ThresholdPolicy, TimeoutPolicy, default_scenarios,
+                       run_scenario, simulate, sweep, synthetic_arrivals, _init_worker)
+from truck_history import HOUR
+
+def stream(*items, branch_id='branch-a', destination='CityB'):
+    return [Arrival(hours * HOUR, branch_id, destination, volume) for hours, volume in items]
+
+def test_threshold_policy_matches_check_truck_allocation():
+    """Test everything pending leaves once the threshold is reached, even past capacity."""
+    report = simulate(stream((0, 200), (1, 200), (2, 200)), ThresholdPolicy(500), end=4 * HOUR, detail=True)
+    assert report['trips'] == 1
+    assert report['overloaded_trips'] == 1
+    assert report['avg_waiting_time_hours'] == pytest.approx(1.0)
+    assert report['pending_at_end'] == 0
+    assert report['trucks'][0]['consignments_handled'] == 3
+    assert report['trucks'][0]['in_transit_hours'] == pytest.approx(2.0)
+
+def test_timeout_policy_sends_stale_consignments():
+    """Test a truck leaves once the oldest consignment has waited max_wait."""
+    report = simulate(stream((0, 50), (0.5, 50)), TimeoutPolicy(500, max_wait=1 * HOUR), end=2 * HOUR)
+    assert report['trips'] == 1
+    assert report['avg_waiting_time_hours'] == pytest.approx(0.75)
+    report = simulate(stream((0, 50), (0.5, 50)), ThresholdPolicy(500), end=2 * HOUR)
+    assert report['trips'] == 0 and report['pending_at_end'] == 2
+
+def test_capacity_aware_policy_never_overloads():
+    """Test loads are packed FIFO up to capacity and split across trucks."""
+    report = simulate(stream((0, 250), (1, 250), (2, 250), (3, 250), (4, 250)),
+                      CapacityAwarePolicy(fill=0.8), trucks_per_branch=3, end=5 * HOUR)
+    assert report['trips'] == 2
+    assert report['overloaded_trips'] == 0
+    assert report['avg_load_factor'] == pytest.approx(1.0)
+    assert report['pending_at_end'] == 1
+
+def test_busy_trucks_delay_dispatch_and_count_idle_time():
+    """Test a consignment waits for the truck to return and idle time is tracked."""
+    report = simulate(stream((0, 500), (1, 500)), ThresholdPolicy(500), trucks_per_branch=1,
+                      trip_seconds=10 * HOUR, end=20 * HOUR)
+    assert report['trips'] == 2
+    assert report['avg_waiting_time_hours'] == pytest.approx(4.5)
+    assert report['utilization'] == pytest.approx(1.0)
+    assert report['avg_idle_time_hours'] == pytest.approx(0.0)
+
+def test_sweep_matches_sequential_runs():
+    """Test the process pool returns the same results, in scenario order."""
+    arrivals = synthetic_arrivals(seed=3, branches=2, destinations=3, days=3)
+    scenarios = default_scenarios(trucks_per_branch=(1,), trip_hours=(12,))[:6]
+    _init_worker(arrivals)
+    assert sweep(arrivals, scenarios, workers=2) == [run_scenario(s) for s in scenarios]
+
+def test_arrivals_only_threshold_waits_for_next_booking():
+    """Test the production rule leaves a ready load waiting when a truck returns with no new booking."""
+    report = simulate(stream((0, 500), (1, 500)), ThresholdPolicy(500, arrivals_only=True), trucks_per_branch=1,
+                      trip_seconds=10 * HOUR, end=20 * HOUR)
+    assert report['trips'] == 1
+    assert report['pending_at_end'] == 1
+    assert report['arrivals_only'] is True
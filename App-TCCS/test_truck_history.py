@@ -0,0 +1,70 @@
+# tests/test_truck_history.py
+
+import pytest
+from datetime import datetime
+from app import Truck, TruckEvent, TruckStatusRollup
+from truck_history import HOUR, DAY, split_interval, cover_range, status_code, to_timestamp
+
+def test_split_interval_across_buckets():
+    """Test an interval is split into per-bucket seconds."""
+    assert list(split_interval(HOUR - 60, 2 * HOUR + 30, HOUR)) == [(0, 60), (HOUR, HOUR), (2 * HOUR, 30)]
+
+def test_cover_range_uses_days_for_whole_days():
+    """Test the lookup plan reads day rollups in the middle and hours on the edges."""
+    start, end, ranges = cover_range(DAY - 2 * HOUR + 5, 3 * DAY + HOUR - 5)
+    assert (start, end) == (DAY - 2 * HOUR, 3 * DAY + HOUR)
+    assert sorted(ranges) == [(HOUR, DAY - 2 * HOUR, DAY), (HOUR, 3 * DAY, 3 * DAY + HOUR), (DAY, DAY, 3 * DAY)]
+
+def test_status_change_appends_event_and_rollup(db_session):
+    """Test every status/location change is logged and the previous state rolled up."""
+    truck = Truck(id='truck-history', location='CityA', branch_id='branch-citya')
+    db_session.add(truck)
+    db_session.commit()
+    # Backdate the creation event so the closed interval is measurable.
+    event = db_session.query(TruckEvent).filter_by(truck_id=truck.id).one()
+    assert event.status == status_code('Available')
+    event.ts -= 2 * HOUR
+    db_session.commit()
+
+    truck.status = 'In-Transit'
+    db_session.commit()
+    truck.location = 'Capital'
+    db_session.commit()
+
+    events = db_session.query(TruckEvent).filter_by(truck_id=truck.id).order_by(TruckEvent.id).all()
+    assert [(e.status, e.location) for e in events] == [
+        (status_code('Available'), 'CityA'), (status_code('In-Transit'), 'CityA'), (status_code('In-Transit'), 'Capital')
+    ]
+    rollups = db_session.query(TruckStatusRollup).filter_by(truck_id=truck.id, bucket_size=DAY).all()
+    idle = sum(r.seconds for r in rollups if r.status == status_code('Available'))
+    assert 2 * HOUR - 5 <= idle <= 2 * HOUR + 5
+
+def test_utilization_report_from_rollups(logged_in_manager, db_session):
+    """Test /reports/utilization answers from rollups plus the open interval."""
+    db_session.add(Truck(id='truck-util', location='CityA', branch_id='branch-citya'))
+    db_session.commit()
+    db_session.query(TruckEvent).filter_by(truck_id='truck-util').delete()
+    base = to_timestamp(datetime(2024, 1, 1))
+    for size in (HOUR, DAY):
+        for bucket, seconds in split_interval(base, base + 6 * HOUR, size):
+            db_session.add(TruckStatusRollup(truck_id='truck-util', bucket_size=size, bucket_start=bucket,
+                                             status=status_code('In-Transit'), seconds=seconds))
+    db_session.add(TruckEvent(truck_id='truck-util', ts=base + 6 * HOUR, status=status_code('Available'), location='CityA'))
+    db_session.commit()
+
+    response = logged_in_manager.get('/reports/utilization?start=2024-01-01T00:00:00&end=2024-01-01T08:00:00')
+    print(f"Response Data: {response.data.decode(errors='ignore')}")
+    assert response.status_code == 200
+    report = {t['truck_id']: t for t in response.get_json()['trucks']}
+    assert report['truck-util']['in_transit_hours'] == 6
+    assert report['truck-util']['idle_hours'] == 2
+    assert report['truck-util']['utilization'] == 0.75
+
+def test_truck_history_trace(logged_in_manager, db_session, ensure_truck_citya1_exists):
+    """Test /trucks/<id>/history returns the location trace."""
+    truck = ensure_truck_citya1_exists
+    truck.location = 'Capital'
+    db_session.commit()
+    response = logged_in_manager.get(f'/trucks/{truck.id}/history')
+    assert response.status_code == 200
+    assert [e['location'] for e in response.get_json()['events']] == ['CityA Depot Test Fixture', 'Capital']
@@ -0,0 +1,60 @@
+import calendar
+
+HOUR = 3600
+DAY = 86400
+BUCKET_SIZES = (HOUR, DAY)
+
+# Truck statuses are stored as small integers in the event log and rollups.
+STATUS_CODES = {'Available': 0, 'In-Transit': 1}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN_STATUS = -1
+
+
+def status_code(status):
+    return STATUS_CODES.get(status, UNKNOWN_STATUS)
+
+
+def status_name(code):
+    return STATUS_NAMES.get(code, 'Unknown')
+
+
+def to_timestamp(dt):
+    """Naive UTC datetime (as stored by the models) to integer epoch seconds."""
+    return calendar.timegm(dt.utctimetuple())
+
+
+def floor_to(ts, size):
+    return ts - ts % size
+
+
+def ceil_to(ts, size):
+    return -(-ts // size) * size
+
+
+def split_interval(start, end, size):
+    """Yield ``(bucket_start, seconds)`` for the part of [start, end) in each bucket."""
+    bucket = floor_to(start, size)
+    while bucket < end:
+        seconds = min(end, bucket + size) - max(start, bucket)
+        if seconds > 0:
+            yield bucket, seconds
+        bucket += size
+
+
+def cover_range(start, end):
+    """Split the hour-aligned range around [start, end) into rollup lookups.
+
+    Returns ``(aligned_start, aligned_end, ranges)`` where ``ranges`` is a list
+    of ``(bucket_size, first_bucket, end_bucket)``: whole days in the middle,
+    hours on the partial-day edges.
+    """
+    start, end = floor_to(start, HOUR), ceil_to(end, HOUR)
+    first_day, last_day = ceil_to(start, DAY), floor_to(end, DAY)
+    if first_day >= last_day:
+        return start, end, [(HOUR, start, end)] if start < end else []
+    ranges = [(DAY, first_day, last_day)]
+    if start < first_day:
+        ranges.append((HOUR, start, first_day))
+    if last_day < end:
+        ranges.append((HOUR, last_day, end))
+    return start, end, ranges